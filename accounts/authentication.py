@@ -1,20 +1,14 @@
-from django.contrib.auth.models import User
+from .backends import EmailOrUsernameModelBackend
 
 
-class EmailAuthBackend:
-    """User can log-in using email or username"""
+class EmailAuthBackend(EmailOrUsernameModelBackend):
+    """
+    Old dotted path, kept only so sessions logged in through it stay valid.
 
-    def authenticate(self, request, username=None, password=None):
-        try:
-            user = User.objects.get(email=username)
-            if user.check_password(password):
-                return user
-            return None
-        except (User.DoesNotExist, User.MultipleObjectsReturned):
-            return None
+    Django stores the backend path in the session and logs the user out when
+    that path is no longer in AUTHENTICATION_BACKENDS. Logins are handled by
+    EmailOrUsernameModelBackend, so this never authenticates itself.
+    """
 
-    def get_user(self, user_id):
-        try:
-            return User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        return None
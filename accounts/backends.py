@@ -1,21 +1,52 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
 from django.db.models import Q
+from django.db.models.functions import Lower
 
 UserModel = get_user_model()
 
 
 class EmailOrUsernameModelBackend(ModelBackend):
+    """
+    Log in with either username or email address.
+
+    Both are resolved in one query; the email side matches LOWER(email) so it
+    can use the functional index from accounts.0002. The password is hashed
+    exactly once per attempt, including a dummy hash for unknown users so
+    response times don't reveal which accounts exist.
+
+    Inactive users are returned so login_view can tell them to verify their
+    email; get_user() still refuses them for existing sessions.
+    """
+
     def authenticate(self, request, username=None, password=None, **kwargs):
         if username is None:
             username = kwargs.get(UserModel.USERNAME_FIELD)
-        try:
-            # Try to fetch user by username or email
-            user = UserModel.objects.get(
-                Q(username__iexact=username) | Q(email__iexact=username)
-            )
-        except UserModel.DoesNotExist:
+        if username is None or password is None:
             return None
-        else:
-            if user.check_password(password) and self.user_can_authenticate(user):
+
+        user = self.get_user_by_login(username)
+        if user is None:
+            # Run the default password hasher once to reduce the timing
+            # difference between an existing and a nonexistent user.
+            UserModel().set_password(password)
+            return None
+
+        if user.check_password(password):
+            return user
+        return None
+
+    def get_user_by_login(self, login):
+        """Exact username match wins; otherwise a single case-insensitive email match"""
+        candidates = list(
+            UserModel._default_manager.annotate(email_lower=Lower("email")).filter(
+                Q(username=login) | Q(email_lower=login.lower())
+            )[:3]
+        )
+        for user in candidates:
+            if user.username == login:
                 return user
+        if len(candidates) == 1:
+            return candidates[0]
+        # No match, or the email is shared by several accounts
+        return None
@@ -0,0 +1,137 @@
+# accounts/dashboard.py
+import time
+
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from shop.models import Order, OrderItem, Product
+from .models import MemberResource, UserProfile
+
+# Invalidation only reaches other workers through a shared cache (CACHE_URL);
+# the timeout bounds how stale another worker's copy can be without one
+SUMMARY_TIMEOUT = 60 * 5
+RESOURCES_VERSION_KEY = "dashboard:resources:version"
+
+
+def summary_key(user_id):
+    return f"dashboard:summary:{user_id}"
+
+
+def get_resources_version():
+    # Start from the clock so an expired version key never reuses a number
+    # whose cached resource list is still around
+    return cache.get_or_set(RESOURCES_VERSION_KEY, int(time.time()), SUMMARY_TIMEOUT)
+
+
+def get_member_resources(version=None):
+    """Active member resources, cached per resource list version"""
+    version = version or get_resources_version()
+    key = f"dashboard:resources:{version}"
+    resources = cache.get(key)
+    if resources is None:
+        resources = list(
+            MemberResource.objects.filter(is_active=True).order_by(
+                "order", "-created_at"
+            )
+        )
+        cache.set(key, resources, SUMMARY_TIMEOUT)
+    return resources
+
+
+def get_dashboard_summary(user):
+    """
+    Everything the dashboard shows for one user, cached until an order
+    completes, a favourite changes or the member resources are edited.
+    Favourites are kept as ids so product edits show up straight away; load
+    them with get_favourite_products().
+    """
+    resources_version = get_resources_version()
+    summary = cache.get(summary_key(user.pk))
+    if summary is not None and summary["resources_version"] == resources_version:
+        return summary
+
+    profile = UserProfile.objects.filter(user=user).first()
+    summary = {
+        "purchased_count": (
+            OrderItem.objects.filter(order__user=user)
+            .values("product")
+            .distinct()
+            .count()
+        ),
+        "favourite_product_ids": (
+            list(profile.favourite_products.values_list("pk", flat=True))
+            if profile
+            else []
+        ),
+        "profile_verified": bool(profile and profile.verified),
+        "resources_version": resources_version,
+    }
+    cache.set(summary_key(user.pk), summary, SUMMARY_TIMEOUT)
+    return summary
+
+
+def get_favourite_products(ids):
+    return list(Product.objects.filter(pk__in=ids)) if ids else []
+
+
+def invalidate_dashboard_summary(user_id):
+    if user_id:
+        cache.delete(summary_key(user_id))
+
+
+def bump_resources_version():
+    try:
+        cache.incr(RESOURCES_VERSION_KEY)
+    except ValueError:
+        cache.set(RESOURCES_VERSION_KEY, int(time.time()), SUMMARY_TIMEOUT)
+
+
+# -------------------------------
+# Invalidation
+# -------------------------------
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, **kwargs):
+    if instance.status == "completed":
+        invalidate_dashboard_summary(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=OrderItem)
+def order_item_changed(sender, instance, created=True, **kwargs):
+    # Download counter updates don't change the summary, only new/removed items
+    if not created:
+        return
+    if OrderItem.order.is_cached(instance):
+        user_id = instance.order.user_id
+    else:
+        user_id = (
+            Order.objects.filter(pk=instance.order_id)
+            .values_list("user_id", flat=True)
+            .first()
+        )
+    invalidate_dashboard_summary(user_id)
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_saved(sender, instance, **kwargs):
+    invalidate_dashboard_summary(instance.user_id)
+
+
+@receiver(m2m_changed, sender=UserProfile.favourite_products.through)
+def favourites_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_dashboard_summary(instance.user_id)
+        return
+    # Changed from the product side: pk_set holds profile ids
+    profiles = UserProfile.objects.all()
+    if pk_set is not None:
+        profiles = profiles.filter(pk__in=pk_set)
+    for user_id in profiles.values_list("user_id", flat=True):
+        invalidate_dashboard_summary(user_id)
+
+
+@receiver([post_save, post_delete], sender=MemberResource)
+def member_resources_changed(sender, **kwargs):
+    bump_resources_version()
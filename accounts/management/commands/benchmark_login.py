@@ -0,0 +1,69 @@
+# accounts/management/commands/benchmark_login.py
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Measure authenticate() latency for username, email and failed logins"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=20,
+            help="Attempts per scenario (default: 20)",
+        )
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        password = uuid.uuid4().hex
+
+        # Everything runs inside a transaction that is rolled back at the end,
+        # so the benchmark user never persists.
+        try:
+            with transaction.atomic():
+                suffix = uuid.uuid4().hex[:8]
+                user = User.objects.create_user(
+                    username=f"bench-{suffix}",
+                    email=f"Bench-{suffix}@example.com",
+                    password=password,
+                )
+                scenarios = [
+                    ("username", user.username, password),
+                    ("email", user.email.lower(), password),
+                    ("wrong password", user.username, "not-the-password"),
+                    ("unknown user", f"nobody-{suffix}@example.com", password),
+                ]
+                for label, login, secret in scenarios:
+                    self.run_scenario(label, login, secret, iterations)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def run_scenario(self, label, login, secret, iterations):
+        timings = []
+        queries = 0
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                authenticate(None, username=login, password=secret)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = len(ctx)
+
+        timings.sort()
+        p95 = timings[min(int(len(timings) * 0.95), len(timings) - 1)]
+        self.stdout.write(
+            f"{label:<15} p50 {statistics.median(timings):8.2f} ms  "
+            f"p95 {p95:8.2f} ms  queries/attempt {queries}"
+        )
@@ -3,29 +3,39 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from accounts.models import UserProfile
 
+
 class Command(BaseCommand):
-    help = 'Creates UserProfile objects for users who do not have one'
+    help = "Creates UserProfile objects for users who do not have one"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows to insert per query (default 1000)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        # One LEFT JOIN ... WHERE profile.id IS NULL instead of a probe per user
+        user_ids = User.objects.filter(profile__isnull=True).values_list(
+            "id", flat=True
+        )
 
-    def handle(self, *args, **kwargs):
-        users_without_profiles = []
-        
-        # Find users without profiles
-        for user in User.objects.all():
-            try:
-                # Just checking if this raises an exception
-                user.profile
-            except User.profile.RelatedObjectDoesNotExist:
-                users_without_profiles.append(user)
-        
-        # Create profiles for users who don't have one
         profiles_created = 0
-        for user in users_without_profiles:
-            UserProfile.objects.create(user=user)
-            profiles_created += 1
-        
+        batch = []
+        for user_id in user_ids.iterator(chunk_size=batch_size):
+            batch.append(UserProfile(user_id=user_id))
+            if len(batch) >= batch_size:
+                UserProfile.objects.bulk_create(batch, ignore_conflicts=True)
+                profiles_created += len(batch)
+                batch = []
+        if batch:
+            UserProfile.objects.bulk_create(batch, ignore_conflicts=True)
+            profiles_created += len(batch)
+
         self.stdout.write(
             self.style.SUCCESS(
-                f'Successfully created {profiles_created} missing user profiles'
+                f"Successfully created {profiles_created} missing user profiles"
             )
         )
-        
\ No newline at end of file
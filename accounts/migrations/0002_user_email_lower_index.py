@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Functional index on LOWER(auth_user.email) for
+    accounts.backends.EmailOrUsernameModelBackend. auth.User belongs to
+    django.contrib.auth, so the index is created with raw SQL.
+    """
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("auth", "0012_alter_user_first_name_max_length"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX IF NOT EXISTS accounts_user_email_lower_idx "
+                "ON auth_user (LOWER(email));"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS accounts_user_email_lower_idx;",
+        ),
+    ]
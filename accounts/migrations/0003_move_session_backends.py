@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.db import migrations
+from django.utils import timezone
+
+# Backends that were listed before accounts.backends replaced them
+OLD_BACKENDS = {
+    "django.contrib.auth.backends.ModelBackend",
+    "accounts.authentication.EmailAuthBackend",
+}
+NEW_BACKEND = "accounts.backends.EmailOrUsernameModelBackend"
+
+
+def move_sessions(apps, schema_editor):
+    """
+    Point live sessions at the new backend so nobody is logged out by the
+    switch. Only database sessions can be rewritten here.
+    """
+    if settings.SESSION_ENGINE != "django.contrib.sessions.backends.db":
+        return
+    from django.contrib.sessions.backends.db import SessionStore
+
+    Session = apps.get_model("sessions", "Session")
+    store = SessionStore()
+    live = Session.objects.using(schema_editor.connection.alias).filter(
+        expire_date__gt=timezone.now()
+    )
+    for session in live.iterator():
+        data = store.decode(session.session_data)
+        if data.get(BACKEND_SESSION_KEY) not in OLD_BACKENDS:
+            continue
+        data[BACKEND_SESSION_KEY] = NEW_BACKEND
+        session.session_data = store.encode(data)
+        session.save(update_fields=["session_data"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0002_user_email_lower_index"),
+        ("sessions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(move_sessions, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,7 @@
 # accounts/models.py
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 import uuid
@@ -19,22 +19,75 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s profile"
 
-
-# Create a UserProfile automatically when a User is created
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        UserProfile.objects.create(user=instance)
+    def is_favourite(self, product):
+        """Indexed existence check on the through table"""
+        return self.favourite_products.through.objects.filter(
+            userprofile_id=self.pk, product_id=product.pk
+        ).exists()
+
+    def toggle_favourite(self, product):
+        """
+        Add or remove product from favourites with a single DELETE, plus one
+        INSERT when it wasn't there. Returns True if it is now a favourite.
+        Writes the through table directly, so the post_add / post_remove
+        m2m_changed signal is sent here (the pre_ actions are not).
+        """
+        through = self.favourite_products.through
+        deleted, _ = through.objects.filter(
+            userprofile_id=self.pk, product_id=product.pk
+        ).delete()
+        if not deleted:
+            through.objects.bulk_create(
+                [through(userprofile_id=self.pk, product_id=product.pk)],
+                ignore_conflicts=True,
+            )
+        m2m_changed.send(
+            sender=through,
+            instance=self,
+            action="post_remove" if deleted else "post_add",
+            reverse=False,
+            model=type(product),
+            pk_set={product.pk},
+            using=self._state.db,
+        )
+        return not deleted
+
+
+def favourite_product_ids(user, products):
+    """
+    Return the ids of `products` (instances or ids) that `user` has
+    favourited, in one query, for heart icons on listing pages.
+    """
+    if not user.is_authenticated:
+        return set()
+    ids = [getattr(product, "pk", product) for product in products]
+    if not ids:
+        return set()
+    return set(
+        UserProfile.favourite_products.through.objects.filter(
+            userprofile__user_id=user.pk, product_id__in=ids
+        ).values_list("product_id", flat=True)
+    )
 
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    # Check if profile exists before trying to save it
-    # This fixes the "User has no profile" error for existing users
+def get_profile(user):
+    """
+    The user's profile, created on first use for accounts that predate the
+    post_save receiver or were bulk-created without one.
+    """
     try:
-        instance.profile.save()
+        return user.profile
     except User.profile.RelatedObjectDoesNotExist:
-        # Create a profile for existing users who don't have one
+        profile, _ = UserProfile.objects.get_or_create(user=user)
+        user.profile = profile
+        return profile
+
+
+# Create a UserProfile when a User is created. Later user saves (last_login
+# on every login, admin edits) leave the profile alone.
+@receiver(post_save, sender=User)
+def create_user_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
         UserProfile.objects.create(user=instance)
 
 
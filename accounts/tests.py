@@ -1,3 +1,265 @@
-from django.test import TestCase
+from importlib import import_module
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth import BACKEND_SESSION_KEY, authenticate
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from shop.models import Category, Product
+
+from .backends import EmailOrUsernameModelBackend
+from .dashboard import get_dashboard_summary
+from .models import favourite_product_ids
+from .throttling import SlidingWindow, get_client_ip
+
+
+class ClientIpTests(SimpleTestCase):
+    def request(self, forwarded):
+        return RequestFactory().get(
+            "/", REMOTE_ADDR="10.0.0.2", HTTP_X_FORWARDED_FOR=forwarded
+        )
+
+    def test_remote_addr_by_default(self):
+        self.assertEqual(get_client_ip(self.request("1.2.3.4")), "10.0.0.2")
+
+    @override_settings(LOGIN_THROTTLE_IP_HEADER="HTTP_X_FORWARDED_FOR")
+    def test_client_supplied_entries_are_ignored(self):
+        # The client sent "6.6.6.6", our proxy appended the real address
+        request = self.request("6.6.6.6, 203.0.113.9")
+        self.assertEqual(get_client_ip(request), "203.0.113.9")
+
+    @override_settings(
+        LOGIN_THROTTLE_IP_HEADER="HTTP_X_FORWARDED_FOR",
+        LOGIN_THROTTLE_PROXY_COUNT=2,
+    )
+    def test_counts_our_proxies_from_the_right(self):
+        request = self.request("6.6.6.6, 203.0.113.9, 198.51.100.1")
+        self.assertEqual(get_client_ip(request), "203.0.113.9")
+
+    @override_settings(LOGIN_THROTTLE_IP_HEADER="HTTP_X_FORWARDED_FOR")
+    def test_missing_header_falls_back_to_remote_addr(self):
+        request = RequestFactory().get("/", REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(get_client_ip(request), "10.0.0.2")
+
+
+class SlidingWindowTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.window = SlidingWindow("test", "someone", limit=4, period=100)
+
+    def test_previous_window_is_weighted(self):
+        for _ in range(4):
+            self.window.hit(now=1050)
+        self.assertEqual(self.window.count(now=1150), 2)
+        self.assertEqual(self.window.count(now=1175), 1)
+
+    def test_retry_after_waits_for_the_previous_window_to_decay(self):
+        for _ in range(8):
+            self.window.hit(now=1050)
+        # 8 * (1 - 0.1) = 7.2 now; below 4 once the weight is under 0.5
+        now = 1110
+        retry_after = self.window.retry_after(now=now)
+        self.assertEqual(retry_after, 41)
+        self.assertGreaterEqual(self.window.count(now=now + retry_after - 1), 4)
+        self.assertLess(self.window.count(now=now + retry_after), 4)
+
+    def test_retry_after_spans_the_next_window(self):
+        for _ in range(8):
+            self.window.hit(now=1010)
+        # 10s left in this window, then 8 decays below 4 after 50s more
+        retry_after = self.window.retry_after(now=1090)
+        self.assertEqual(retry_after, 61)
+        self.assertLess(self.window.count(now=1090 + retry_after), 4)
+
+
+@override_settings(
+    LOGIN_THROTTLE_RATES={"ip": "3/5m", "account": "2/15m"},
+    LOGIN_THROTTLE_IP_HEADER="HTTP_X_FORWARDED_FOR",
+)
+class LoginThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("member", "member@example.com", "pw")
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self, username, password="wrong", forwarded="203.0.113.9"):
+        return self.client.post(
+            reverse("accounts:login"),
+            {"username": username, "password": password},
+            HTTP_X_FORWARDED_FOR=forwarded,
+        )
+
+    def test_account_limit(self):
+        for _ in range(2):
+            self.assertEqual(self.login("member").status_code, 200)
+        response = self.login("member", password="pw")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    def test_rotating_forwarded_for_does_not_reset_the_ip_limit(self):
+        for index in range(3):
+            self.login(f"user{index}", forwarded=f"10.9.9.{index}, 203.0.113.9")
+        response = self.login("user9", forwarded="10.9.9.9, 203.0.113.9")
+        self.assertEqual(response.status_code, 429)
+
+    def test_success_clears_the_account_counter(self):
+        self.login("member")
+        self.assertEqual(self.login("member", password="pw").status_code, 302)
+        self.client.logout()
+        self.login("member")
+        self.assertEqual(self.login("member", password="pw").status_code, 302)
+
+
+class EmailOrUsernameBackendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("member", "Member@Example.com", "pw")
+
+    def test_username_login(self):
+        self.assertEqual(authenticate(username="member", password="pw"), self.user)
+
+    def test_email_login_ignores_case(self):
+        for login in ["Member@Example.com", "member@example.COM"]:
+            with self.subTest(login=login):
+                self.assertEqual(authenticate(username=login, password="pw"), self.user)
+
+    def test_wrong_password_and_unknown_login(self):
+        self.assertIsNone(authenticate(username="member", password="nope"))
+        self.assertIsNone(authenticate(username="someone@example.com", password="pw"))
+
+    def test_shared_email_is_ambiguous(self):
+        User.objects.create_user("other", "member@example.com", "pw")
+        self.assertIsNone(authenticate(username="member@example.com", password="pw"))
+        self.assertEqual(authenticate(username="member", password="pw"), self.user)
+
+    def test_inactive_user_is_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.post(
+            reverse("accounts:login"), {"username": "member", "password": "pw"}
+        )
+        self.assertContains(response, "Account not activated")
+        self.assertNotIn("_auth_user_id", self.client.session)
+        self.assertIsNone(EmailOrUsernameModelBackend().get_user(self.user.pk))
+
+    def test_sessions_from_the_old_backend_stay_logged_in(self):
+        self.client.force_login(
+            self.user, backend="accounts.authentication.EmailAuthBackend"
+        )
+        response = self.client.get(reverse("accounts:dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(authenticate(username="member", password="nope"))
+
+    def test_migration_moves_old_sessions_to_the_new_backend(self):
+        migration = import_module("accounts.migrations.0003_move_session_backends")
+        store = SessionStore()
+        store.update(
+            {
+                "_auth_user_id": str(self.user.pk),
+                BACKEND_SESSION_KEY: "django.contrib.auth.backends.ModelBackend",
+            }
+        )
+        store.create()
+
+        migration.move_sessions(apps, SimpleNamespace(connection=connection))
+        moved = SessionStore(store.session_key).load()
+        self.assertEqual(moved[BACKEND_SESSION_KEY], migration.NEW_BACKEND)
+        self.assertEqual(moved["_auth_user_id"], str(self.user.pk))
+
+
+class FavouriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("member", "member@example.com", "pw")
+        category = Category.objects.create(name="Guides", slug="guides")
+        cls.products = [
+            Product.objects.create(
+                title=title,
+                category=category,
+                description="<p>Guide</p>",
+                price_pence=500,
+                status="publish",
+            )
+            for title in ["Planner", "Journal", "Workbook"]
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.profile = self.user.profile
+
+    def test_toggle_adds_then_removes(self):
+        planner = self.products[0]
+        self.assertTrue(self.profile.toggle_favourite(planner))
+        self.assertTrue(self.profile.is_favourite(planner))
+        self.assertFalse(self.profile.toggle_favourite(planner))
+        self.assertFalse(self.profile.is_favourite(planner))
+
+    def test_favourite_ids_for_a_listing_in_one_query(self):
+        planner, journal, workbook = self.products
+        self.profile.toggle_favourite(planner)
+        self.profile.toggle_favourite(workbook)
+        with self.assertNumQueries(1):
+            ids = favourite_product_ids(self.user, [planner, journal.pk, workbook])
+        self.assertEqual(ids, {planner.pk, workbook.pk})
+
+    def test_favourite_ids_without_a_user_or_products(self):
+        self.assertEqual(favourite_product_ids(self.user, []), set())
+        anonymous = SimpleNamespace(is_authenticated=False)
+        self.assertEqual(favourite_product_ids(anonymous, self.products), set())
+
+    def test_toggle_invalidates_the_dashboard_summary(self):
+        planner = self.products[0]
+        self.assertEqual(get_dashboard_summary(self.user)["favourite_product_ids"], [])
+        self.profile.toggle_favourite(planner)
+        summary = get_dashboard_summary(self.user)
+        self.assertEqual(summary["favourite_product_ids"], [planner.pk])
+        self.profile.toggle_favourite(planner)
+        self.assertEqual(get_dashboard_summary(self.user)["favourite_product_ids"], [])
+
+
+class DashboardSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("member", "member@example.com", "pw")
+        category = Category.objects.create(name="Guides", slug="guides")
+        cls.product = Product.objects.create(
+            title="Planner",
+            category=category,
+            description="<p>Plan</p>",
+            price_pence=500,
+            status="publish",
+        )
+        cls.user.profile.favourite_products.add(cls.product)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_cached_favourites_follow_product_edits(self):
+        response = self.client.get(reverse("accounts:dashboard"))
+        self.assertEqual(response.context["favourite_products"], [self.product])
+
+        self.product.title = "Weekly planner"
+        self.product.save()
+        response = self.client.get(reverse("accounts:dashboard"))
+        self.assertContains(response, "Weekly planner")
+
+    def test_warm_summary_costs_no_queries(self):
+        get_dashboard_summary(self.user)
+        with self.assertNumQueries(0):
+            get_dashboard_summary(self.user)
+
+    def test_warm_dashboard_request(self):
+        self.client.get(reverse("accounts:dashboard"))
+        # Session and user (2), favourite products (1), session save with
+        # SESSION_SAVE_EVERY_REQUEST (savepoint, update, release = 3)
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse("accounts:dashboard"))
+        self.assertEqual(response.context["favourite_products"], [self.product])
@@ -0,0 +1,166 @@
+# accounts/throttling.py
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULT_RATES = {
+    "ip": "20/5m",  # failed logins per client IP
+    "account": "5/15m",  # failed logins per username/email
+}
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+RATE_RE = re.compile(r"^\s*(\d+)\s*/\s*(\d*)\s*([smhd])\s*$")
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def get_throttle_stats():
+    """Process-local counters for monitoring (checks, failures, rejections)"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _bump(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def parse_rate(rate):
+    """'5/15m' -> (5, 900)"""
+    match = RATE_RE.match(rate or "")
+    if not match:
+        raise ValueError(f"Invalid throttle rate: {rate!r}")
+    limit, multiplier, unit = match.groups()
+    return int(limit), int(multiplier or 1) * PERIODS[unit]
+
+
+def get_client_ip(request):
+    """
+    Client address from LOGIN_THROTTLE_IP_HEADER. In X-Forwarded-For style
+    lists only the entries appended by our own LOGIN_THROTTLE_PROXY_COUNT
+    proxies are trusted, so the address is counted from the right; anything
+    further left was sent by the client.
+    """
+    header = getattr(settings, "LOGIN_THROTTLE_IP_HEADER", "REMOTE_ADDR")
+    value = request.META.get(header) or request.META.get("REMOTE_ADDR", "")
+    hops = [hop.strip() for hop in value.split(",") if hop.strip()]
+    if not hops:
+        return ""
+    proxies = max(getattr(settings, "LOGIN_THROTTLE_PROXY_COUNT", 1), 1)
+    return hops[-min(proxies, len(hops))]
+
+
+class SlidingWindow:
+    """
+    Sliding-window counter kept in the cache.
+
+    Uses two fixed windows and weights the previous one by how much of it
+    still overlaps the sliding window, so only cache.add/incr are needed
+    (both atomic on memcached/redis/locmem). Limits only hold across
+    workers when they share the cache (CACHE_URL); with the default locmem
+    cache each worker counts separately.
+    """
+
+    def __init__(self, scope, identity, limit, period):
+        digest = hashlib.sha256(identity.encode()).hexdigest()[:32]
+        self.prefix = f"throttle:{scope}:{digest}"
+        self.limit = limit
+        self.period = period
+
+    def _keys(self, now):
+        window = int(now // self.period)
+        return f"{self.prefix}:{window}", f"{self.prefix}:{window - 1}"
+
+    def _counts(self, now):
+        current_key, previous_key = self._keys(now)
+        values = cache.get_many([current_key, previous_key])
+        return values.get(current_key, 0), values.get(previous_key, 0)
+
+    def count(self, now=None):
+        now = now or time.time()
+        current, previous = self._counts(now)
+        elapsed = (now % self.period) / self.period
+        return current + previous * (1 - elapsed)
+
+    def retry_after(self, now=None):
+        """
+        Seconds until count() drops below the limit, assuming no further
+        hits (at least 1)
+        """
+        now = now or time.time()
+        current, previous = self._counts(now)
+        into = now % self.period
+        if current < self.limit:
+            # Over only because of the previous window, whose weight decays
+            # linearly to 0 by the end of this one
+            if not previous:
+                return 1
+            wait = self.period * (1 - (self.limit - current) / previous) - into
+        else:
+            # This window becomes the previous one and decays the same way
+            wait = self.period - into + self.period * (1 - self.limit / current)
+        return max(math.floor(wait) + 1, 1)
+
+    def hit(self, now=None):
+        now = now or time.time()
+        current_key, _ = self._keys(now)
+        cache.add(current_key, 0, timeout=self.period * 2)
+        try:
+            cache.incr(current_key)
+        except ValueError:
+            # Evicted between add and incr
+            cache.set(current_key, 1, timeout=self.period * 2)
+
+    def reset(self):
+        cache.delete_many(list(self._keys(time.time())))
+
+
+class LoginThrottle:
+    """
+    Limits failed logins per client IP and per account.
+
+    check() runs before authenticate() so throttled requests never reach the
+    password hasher. Rates come from settings.LOGIN_THROTTLE_RATES.
+    """
+
+    def __init__(self, request, username):
+        rates = {**DEFAULT_RATES, **getattr(settings, "LOGIN_THROTTLE_RATES", {})}
+        self.windows = {}
+        if rates.get("ip"):
+            self.windows["ip"] = SlidingWindow(
+                "login-ip", get_client_ip(request), *parse_rate(rates["ip"])
+            )
+        if rates.get("account") and username:
+            self.windows["account"] = SlidingWindow(
+                "login-account",
+                username.strip().lower(),
+                *parse_rate(rates["account"]),
+            )
+
+    def check(self):
+        """Return a Retry-After value in seconds if throttled, else None"""
+        _bump("checks")
+        now = time.time()
+        for scope, window in self.windows.items():
+            if window.count(now) >= window.limit:
+                _bump(f"rejected_{scope}")
+                return window.retry_after(now)
+        return None
+
+    def record_failure(self):
+        _bump("failures")
+        now = time.time()
+        for window in self.windows.values():
+            window.hit(now)
+
+    def record_success(self):
+        # A correct password clears the account's counter, not the IP's
+        if "account" in self.windows:
+            self.windows["account"].reset()
@@ -9,9 +9,20 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 from django.urls import reverse
-from shop.models import Product, OrderItem
+from shop.models import Product
 from .forms import UserRegistrationForm, UserProfileForm
-from .models import EmailVerificationToken, MemberResource
+from .models import (
+    EmailVerificationToken,
+    MemberResource,
+    UserProfile,
+    get_profile,
+)
+from .throttling import LoginThrottle
+from .dashboard import (
+    get_dashboard_summary,
+    get_favourite_products,
+    get_member_resources,
+)
 
 
 def register_view(request):
@@ -87,11 +98,12 @@ def verify_email(request, token):
         if verification_token.is_valid():
             user = verification_token.user
             user.is_active = True
-            user.save()
+            user.save(update_fields=["is_active"])
 
             # Mark the profile as verified
-            user.profile.verified = True
-            user.profile.save()
+            profile = get_profile(user)
+            profile.verified = True
+            profile.save(update_fields=["verified"])
 
             # Clean up the token
             verification_token.delete()
@@ -112,8 +124,26 @@ def login_view(request):
     if request.method == "POST":
         username = request.POST.get("username")
         password = request.POST.get("password")
+
+        # Reject throttled attempts before any password hashing happens
+        throttle = LoginThrottle(request, username)
+        retry_after = throttle.check()
+        if retry_after:
+            messages.error(
+                request,
+                "Too many login attempts. Please wait a few minutes and try again.",
+            )
+            response = render(request, "accounts/login.html", status=429)
+            response["Retry-After"] = str(retry_after)
+            return response
+
         user = authenticate(request, username=username, password=password)
 
+        if user is None:
+            throttle.record_failure()
+        else:
+            throttle.record_success()
+
         if user is not None:
             if user.is_active:
                 login(request, user)
@@ -147,25 +177,13 @@ def logout_view(request):
 
 @login_required
 def dashboard_view(request):
-    user = request.user
-
-    # Get purchased products
-    purchased_count = (
-        OrderItem.objects.filter(order__user=user).values("product").distinct().count()
-    )
-
-    # Get saved products
-    favourite_products = user.profile.favourite_products.all()
-
-    # Member resources
-    member_resources = MemberResource.objects.filter(is_active=True).order_by(
-        "order", "-created_at"
-    )
+    summary = get_dashboard_summary(request.user)
 
     context = {
-        "purchased_count": purchased_count,
-        "favourite_products": favourite_products,
-        "member_resources": member_resources,
+        "purchased_count": summary["purchased_count"],
+        "favourite_products": get_favourite_products(summary["favourite_product_ids"]),
+        "profile_verified": summary["profile_verified"],
+        "member_resources": get_member_resources(summary["resources_version"]),
     }
 
     return render(request, "accounts/dashboard.html", context)
@@ -174,13 +192,13 @@ def dashboard_view(request):
 @login_required
 def profile_view(request):
     if request.method == "POST":
-        form = UserProfileForm(request.POST, instance=request.user.profile)
+        form = UserProfileForm(request.POST, instance=get_profile(request.user))
         if form.is_valid():
             form.save()
             messages.success(request, "Your profile has been updated successfully.")
             return redirect("accounts:profile")
     else:
-        form = UserProfileForm(instance=request.user.profile)
+        form = UserProfileForm(instance=get_profile(request.user))
 
     return render(request, "accounts/profile.html", {"form": form})
 
@@ -188,16 +206,13 @@ def profile_view(request):
 @login_required
 def add_favourite_product(request, product_slug):
     product = get_object_or_404(Product, slug=product_slug)
-    user_profile = request.user.profile
+    user_profile, _ = UserProfile.objects.get_or_create(user=request.user)
 
-    if product in user_profile.favourite_products.all():
-        user_profile.favourite_products.remove(product)
-        is_favourite = False
-        messages.success(request, "Product removed from your favourites.")
-    else:
-        user_profile.favourite_products.add(product)
-        is_favourite = True
+    is_favourite = user_profile.toggle_favourite(product)
+    if is_favourite:
         messages.success(request, "Product added to your favourites.")
+    else:
+        messages.success(request, "Product removed from your favourites.")
 
     # Properly detect AJAX request, case-insensitive
     if request.headers.get("x-requested-with", "").lower() == "xmlhttprequest":
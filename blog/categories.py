@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from zestizm.registry import ModelRegistry
+from .models import Category
+
+# Shared, in-memory category list for blog views and sitemaps
+category_registry = ModelRegistry(Category, "blog.category")
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_registry(sender, **kwargs):
+    # After commit, so a concurrent reload can't cache the old rows as new
+    transaction.on_commit(category_registry.invalidate)
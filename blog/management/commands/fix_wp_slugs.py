@@ -1,9 +1,8 @@
 # blog/management/commands/fix_wp_slugs.py
 
-import re
 from django.core.management.base import BaseCommand
-from django.utils.text import slugify
 from blog.models import Post
+from zestizm.utils import invalid_slugs, unique_slugify
 
 
 class Command(BaseCommand):
@@ -24,13 +23,10 @@ class Command(BaseCommand):
                 self.style.WARNING("Running in dry-run mode. No changes will be made.")
             )
 
-        # Get all posts with invalid slugs that might contain WordPress query params
-        invalid_slug_pattern = r"[?&=]"
-        posts_with_invalid_slugs = []
-
-        for post in Post.objects.all():
-            if re.search(invalid_slug_pattern, post.slug):
-                posts_with_invalid_slugs.append(post)
+        # One query: the database applies the slug pattern, not Python
+        posts_with_invalid_slugs = list(
+            invalid_slugs(Post.objects.all()).only("id", "title", "slug")
+        )
 
         self.stdout.write(
             f"Found {len(posts_with_invalid_slugs)} posts with invalid slugs"
@@ -38,20 +34,12 @@ class Command(BaseCommand):
 
         # Fix each invalid slug
         fixed_count = 0
+        # Slugs handed out in this run, so a dry run doesn't propose duplicates
+        allocated = set()
         for post in posts_with_invalid_slugs:
             old_slug = post.slug
-
-            # Generate a new slug from the title
-            new_slug = slugify(post.title)
-
-            # Ensure uniqueness by adding a suffix if needed
-            suffix = 1
-            slug_to_check = new_slug
-            while Post.objects.filter(slug=slug_to_check).exclude(id=post.id).exists():
-                slug_to_check = f"{new_slug}-{suffix}"
-                suffix += 1
-
-            new_slug = slug_to_check
+            new_slug = unique_slugify(post, post.title, reserved=allocated)
+            allocated.add(new_slug)
 
             self.stdout.write(f'Post ID {post.id}: "{post.title}"')
             self.stdout.write(f"  Old slug: {old_slug}")
@@ -10,6 +10,7 @@ from blog.models import Post, Category
 from django.utils.text import slugify
 from django.utils import timezone
 from django.conf import settings
+from zestizm.utils import VALID_SLUG_REGEX, unique_slugify
 import re
 
 
@@ -301,9 +302,10 @@ class Command(BaseCommand):
                     if "/" in link:
                         slug = link.split("/")[-1]
 
-            # Use title as final fallback
-            if not slug:
-                slug = slugify(title)
+            # WordPress slugs are the re-import key; links like "?p=123" are
+            # not valid slugs and fall back to the title below
+            if slug and not re.match(VALID_SLUG_REGEX, slug):
+                slug = None
 
             # Process categories
             categories = []
@@ -333,23 +335,35 @@ class Command(BaseCommand):
             # Create or update post, with a category (use default if none found)
             primary_category = categories[0] if categories else default_category
 
+            publish_date = (
+                timezone.make_aware(post_date)
+                if timezone.is_naive(post_date)
+                else post_date
+            )
+
             # Check that we have required data
             if not title or not content:
                 self.stdout.write(
                     self.style.WARNING(
-                        f"Skipping post with empty title or content: {slug}"
+                        f"Skipping post with empty title or content: {slug or title}"
                     )
                 )
                 return None
 
+            if not slug:
+                # No usable WordPress slug: reuse the post imported last time,
+                # else allocate a free slug from the title
+                existing = Post.objects.filter(
+                    title=title, publish_date=publish_date
+                ).first()
+                slug = existing.slug if existing else unique_slugify(Post(), title)
+
             post_obj, created = Post.objects.update_or_create(
                 slug=slug,
                 defaults={
                     "title": title,
                     "content": content,
-                    "publish_date": timezone.make_aware(post_date)
-                    if timezone.is_naive(post_date)
-                    else post_date,
+                    "publish_date": publish_date,
                     "status": "published",
                     "category": primary_category,
                 },
@@ -1,34 +1,24 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
-from django.utils.html import strip_tags
-from blog.models import Post
 
 
 class Command(BaseCommand):
-    help = "Update empty meta descriptions with content-based fallbacks"
+    help = (
+        "Update empty meta descriptions with content-based fallbacks "
+        "(shortcut for update_meta_seo --descriptions-only)"
+    )
 
-    def handle(self, *args, **options):
-        posts_updated = 0
-        posts = Post.objects.filter(meta_description="").select_related("category")
-
-        for post in posts:
-            # Try introduction first
-            if post.introduction:
-                meta_desc = strip_tags(post.introduction)[:160]
-            # Fall back to content
-            elif post.content:
-                meta_desc = strip_tags(post.content)[:160]
-            # Last resort: use title + category
-            else:
-                meta_desc = f"{post.title} - {post.category.name}"[:160]
-
-            post.meta_description = meta_desc
-            post.save()
-            posts_updated += 1
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--workers", type=int, default=1)
+        parser.add_argument("--dry-run", action="store_true")
 
-            self.stdout.write(f"Updated meta description for: {post.title}")
-
-        self.stdout.write(
-            self.style.SUCCESS(
-                f"Successfully updated {posts_updated} posts with meta descriptions"
-            )
+    def handle(self, *args, **options):
+        call_command(
+            "update_meta_seo",
+            descriptions_only=True,
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            dry_run=options["dry_run"],
+            stdout=self.stdout,
         )
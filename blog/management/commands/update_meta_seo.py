@@ -1,6 +1,7 @@
-from django.core.management.base import BaseCommand
-from django.utils.html import strip_tags
-from blog.models import Post
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from blog.seo import backfill
 
 
 class Command(BaseCommand):
@@ -17,48 +18,67 @@ class Command(BaseCommand):
             action="store_true",
             help="Update only meta descriptions",
         )
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            help="Recompute values that are already set",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Posts per fetch and per bulk update (default 500)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Parallel processes, each taking a slice of the id range",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Compute and report without writing",
+        )
 
     def handle(self, *args, **options):
-        titles_updated = 0
-        descriptions_updated = 0
-
-        update_titles = not options["descriptions_only"]
-        update_descriptions = not options["titles_only"]
-
-        posts = Post.objects.all().select_related("category")
-
-        for post in posts:
-            updated = False
+        if options["titles_only"] and options["descriptions_only"]:
+            raise CommandError(
+                "Choose at most one of --titles-only and --descriptions-only"
+            )
 
-            if update_titles and not post.meta_title:
-                post.meta_title = post.title[:60]
-                titles_updated += 1
-                updated = True
+        parallel = options["workers"] > 1 and not options["dry_run"]
+        if parallel and connection.vendor == "sqlite":
+            raise CommandError("SQLite allows one writer at a time; use --workers 1")
 
-            if update_descriptions and not post.meta_description:
-                if post.introduction:
-                    meta_desc = strip_tags(post.introduction)[:160]
-                elif post.content:
-                    meta_desc = strip_tags(post.content)[:160]
-                else:
-                    meta_desc = f"{post.title} - {post.category.name}"[:160]
+        dry_run = options["dry_run"]
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING("Running in dry-run mode. No changes will be made.")
+            )
 
-                post.meta_description = meta_desc
-                descriptions_updated += 1
-                updated = True
+        try:
+            result = backfill(
+                workers=options["workers"],
+                titles=not options["descriptions_only"],
+                descriptions=not options["titles_only"],
+                overwrite=options["overwrite"],
+                batch_size=options["batch_size"],
+                dry_run=dry_run,
+                samples=5 if dry_run else 0,
+            )
+        except ValueError as e:
+            # No fork() on this platform
+            raise CommandError(f"Parallel workers are unavailable here: {e}")
 
-            if updated:
-                post.save()
+        for pk, title, description in result.samples:
+            self.stdout.write(f"  #{pk}: {title!r} / {description!r}")
 
-        if update_titles:
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"Successfully updated {titles_updated} posts with meta titles"
-                )
-            )
-        if update_descriptions:
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"Successfully updated {descriptions_updated} posts with meta descriptions"
-                )
+        verb = "Would update" if dry_run else "Updated"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {result.titles} meta titles and {result.descriptions} "
+                f"meta descriptions across {result.scanned} posts in "
+                f"{result.seconds:.2f}s ({result.rate:,.0f} posts/s)"
             )
+        )
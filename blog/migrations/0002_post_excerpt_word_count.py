@@ -0,0 +1,71 @@
+import re
+from html import unescape
+
+from django.db import migrations, models
+
+# Frozen copy of zestizm.utils.summarise_html as of this migration, so later
+# changes to the helper can't change (or break) what this backfill does
+_SKIPPED_BLOCKS = re.compile(
+    r"<(script|style|noscript|template)\b.*?(?:</\1\s*>|$)", re.I | re.S
+)
+_COMMENTS = re.compile(r"<!--.*?(?:-->|$)", re.S)
+_TAGS = re.compile(r"<[^>]*(?:>|$)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _html_to_text(html):
+    if not html:
+        return ""
+    html = _COMMENTS.sub(" ", html)
+    html = _SKIPPED_BLOCKS.sub(" ", html)
+    text = _TAGS.sub(" ", html)
+    return _WHITESPACE.sub(" ", unescape(text)).strip()
+
+
+def _truncate_words(text, limit):
+    if len(text) <= limit:
+        return text
+    cut = text[: limit + 1].rsplit(" ", 1)[0]
+    if not cut or cut == text[: limit + 1]:
+        cut = text[:limit]
+    return cut.rstrip(" ,;:-")
+
+
+def summarise_html(*fragments, limit):
+    text = " ".join(filter(None, (_html_to_text(html) for html in fragments)))
+    return _truncate_words(text, limit), len(text.split())
+
+
+def fill_summaries(apps, schema_editor):
+    """Existing posts get their excerpt now rather than on their next save"""
+    Post = apps.get_model("blog", "Post")
+    batch = []
+    for post in Post.objects.only("pk", "content").iterator(chunk_size=500):
+        post.excerpt, post.word_count = summarise_html(post.content, limit=400)
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, ["excerpt", "word_count"])
+            batch = []
+    if batch:
+        Post.objects.bulk_update(batch, ["excerpt", "word_count"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="excerpt",
+            field=models.CharField(blank=True, editable=False, max_length=400),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="word_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,15 @@
 from django.db import models
 from django.urls import reverse
-from django.utils.text import slugify
 from django.utils import timezone
 from tinymce.models import HTMLField
 
+from zestizm.utils import (
+    EXCERPT_LENGTH,
+    summarise_html,
+    truncate_words,
+    unique_slugify,
+)
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
@@ -39,6 +45,9 @@ class Post(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     content = HTMLField("Content")
+    # Plain-text summary of content, maintained by save()
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
 
     category = models.ForeignKey(Category, on_delete=models.PROTECT)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="draft")
@@ -97,11 +106,19 @@ class Post(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.slug:
-            self.slug = slugify(self.title)
+            self.slug = unique_slugify(self, self.title)
         if self.status == "published" and not self.publish_date:
             self.publish_date = timezone.now()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "content" in update_fields:
+            self.update_summary()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "excerpt", "word_count"}
         super().save(*args, **kwargs)
 
+    def update_summary(self):
+        self.excerpt, self.word_count = summarise_html(self.content)
+
     def get_image_url(self):
         """Get the URL for the main image"""
         if self.external_image_url:
@@ -150,12 +167,9 @@ class Post(models.Model):
         """Get meta description with fallback logic"""
         if self.meta_description:
             return self.meta_description
-        # Fall back to content
-        if self.content:
-            from django.utils.html import strip_tags
-
-            clean_content = strip_tags(self.content)
-            return clean_content[:160]
+        # Fall back to the stored excerpt
+        if self.excerpt:
+            return truncate_words(self.excerpt, 160)
 
         # Last resort: use title
         return self.title
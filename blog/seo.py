@@ -0,0 +1,181 @@
+"""
+Meta title/description backfill for posts.
+
+Posts are streamed with iterator(), only the columns the computation needs
+are loaded, and changes are written back with bulk_update per batch. With
+several workers the primary key range is split into contiguous slices, one
+per process.
+"""
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from django.db import connections
+from django.db.models import Max, Min, Q
+
+from zestizm.utils import html_to_text, truncate_words
+
+from .models import Post
+
+TITLE_LENGTH = Post._meta.get_field("meta_title").max_length
+DESCRIPTION_LENGTH = Post._meta.get_field("meta_description").max_length
+
+
+def meta_title_for(title):
+    return truncate_words(title, TITLE_LENGTH)
+
+
+def meta_description_for(title, content, category_name=None):
+    """First sentences of the content, else title and category"""
+    text = html_to_text(content, DESCRIPTION_LENGTH)
+    if text:
+        return text
+    if category_name:
+        return truncate_words(f"{title} - {category_name}", DESCRIPTION_LENGTH)
+    return truncate_words(title, DESCRIPTION_LENGTH)
+
+
+@dataclass
+class BackfillResult:
+    scanned: int = 0
+    titles: int = 0
+    descriptions: int = 0
+    seconds: float = 0.0
+    samples: list = field(default_factory=list)
+
+    @property
+    def updated(self):
+        return self.titles + self.descriptions
+
+    @property
+    def rate(self):
+        return self.scanned / self.seconds if self.seconds else 0.0
+
+    def merge(self, other):
+        self.scanned += other.scanned
+        self.titles += other.titles
+        self.descriptions += other.descriptions
+        self.samples += other.samples
+
+
+def posts_to_backfill(titles=True, descriptions=True, overwrite=False):
+    queryset = Post.objects.all()
+    if not overwrite:
+        missing = Q(pk__in=[])
+        if titles:
+            missing |= Q(meta_title="")
+        if descriptions:
+            missing |= Q(meta_description="")
+        queryset = queryset.filter(missing)
+    return queryset
+
+
+def backfill_range(
+    start=None,
+    stop=None,
+    titles=True,
+    descriptions=True,
+    overwrite=False,
+    batch_size=500,
+    dry_run=False,
+    samples=0,
+):
+    """Backfill posts with start <= pk < stop (either bound may be None)"""
+    queryset = posts_to_backfill(titles, descriptions, overwrite)
+    if start is not None:
+        queryset = queryset.filter(pk__gte=start)
+    if stop is not None:
+        queryset = queryset.filter(pk__lt=stop)
+    queryset = (
+        queryset.select_related("category")
+        .only(
+            "id",
+            "title",
+            "content",
+            "meta_title",
+            "meta_description",
+            "category__name",
+        )
+        .order_by("pk")
+    )
+
+    result = BackfillResult()
+    started = time.perf_counter()
+    batch = []
+    changed_fields = set()
+    for post in queryset.iterator(chunk_size=batch_size):
+        result.scanned += 1
+        changed = False
+        if titles and (overwrite or not post.meta_title):
+            value = meta_title_for(post.title)
+            if value != post.meta_title:
+                post.meta_title = value
+                result.titles += 1
+                changed_fields.add("meta_title")
+                changed = True
+        if descriptions and (overwrite or not post.meta_description):
+            value = meta_description_for(post.title, post.content, post.category.name)
+            if value != post.meta_description:
+                post.meta_description = value
+                result.descriptions += 1
+                changed_fields.add("meta_description")
+                changed = True
+        if not changed:
+            continue
+        if len(result.samples) < samples:
+            result.samples.append((post.pk, post.meta_title, post.meta_description))
+        batch.append(post)
+        if len(batch) >= batch_size:
+            _write(batch, changed_fields, dry_run)
+            batch = []
+            changed_fields = set()
+    if batch:
+        _write(batch, changed_fields, dry_run)
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def _write(batch, fields, dry_run):
+    # bulk_update leaves `updated` alone: a metadata backfill isn't an edit
+    if not dry_run:
+        Post.objects.bulk_update(batch, sorted(fields))
+
+
+def _worker(kwargs):
+    try:
+        return backfill_range(**kwargs)
+    finally:
+        connections.close_all()
+
+
+def backfill(workers=1, **options):
+    """
+    Run backfill_range over all posts, in `workers` processes when > 1.
+    Returns a BackfillResult with wall-clock seconds.
+    """
+    started = time.perf_counter()
+    if workers <= 1:
+        result = backfill_range(**options)
+        result.seconds = time.perf_counter() - started
+        return result
+
+    bounds = Post.objects.aggregate(low=Min("pk"), high=Max("pk"))
+    result = BackfillResult()
+    if bounds["low"] is None:
+        return result
+    step = (bounds["high"] - bounds["low"]) // workers + 1
+    slices = [
+        {**options, "start": low, "stop": low + step}
+        for low in range(bounds["low"], bounds["high"] + 1, step)
+    ]
+
+    # Forked children must not share the parent's database sockets
+    connections.close_all()
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for part in pool.map(_worker, slices):
+            result.merge(part)
+    result.seconds = time.perf_counter() - started
+    return result
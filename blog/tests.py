@@ -1,3 +1,120 @@
-from django.test import TestCase
+import re
+from io import StringIO
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from zestizm.utils import html_to_text, invalid_slugs, truncate_words
+
+from .models import Category, Post
+
+
+class HtmlToTextTests(SimpleTestCase):
+    def test_scripts_styles_and_comments_are_dropped(self):
+        html = (
+            "<p>Hello</p><script>var s = '<p>not text</p>';</script>"
+            "<style>p { color: red }</style><!-- <p>hidden</p> -->"
+            "<noscript>Enable JS</noscript><p>world</p>"
+        )
+        self.assertEqual(html_to_text(html), "Hello world")
+
+    def test_entities_are_unescaped(self):
+        html = "<p>Fish &amp; chips &mdash; &#8220;hot&#8221;&nbsp;now</p>"
+        self.assertEqual(html_to_text(html), "Fish & chips — “hot” now")
+
+    def test_window_ending_inside_a_tag(self):
+        # The first scan window (limit * 8) stops inside the alt attribute
+        html = '<p>alpha beta gamma</p><img alt="' + "x" * 500 + '"><p>delta</p>'
+        self.assertEqual(html_to_text(html, 12), "alpha beta")
+
+    def test_window_grows_until_there_is_enough_text(self):
+        html = '<div data-x="' + "x" * 200 + '"></div><p>alpha beta gamma</p>'
+        self.assertEqual(html_to_text(html, 12), "alpha beta")
+        self.assertEqual(html_to_text(html, 100), "alpha beta gamma")
+
+    def test_truncate_words(self):
+        self.assertEqual(truncate_words("alpha beta gamma", 12), "alpha beta")
+        self.assertEqual(truncate_words("alpha beta", 10), "alpha beta")
+        self.assertEqual(truncate_words("alpha, beta", 8), "alpha")
+        self.assertEqual(truncate_words("abcdefghij", 4), "abcd")
+
+
+class MetaBackfillTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Zest", slug="zest")
+        cls.blank = Post.objects.create(
+            title="Morning routines",
+            content="<p>Start slow. Drink water.</p>",
+            category=category,
+        )
+        cls.filled = Post.objects.create(
+            title="Evening routines",
+            content="<p>Wind down early.</p>",
+            category=category,
+            meta_title="Custom title",
+            meta_description="Custom description",
+        )
+
+    def run_command(self, *args):
+        call_command("update_meta_seo", *args, stdout=StringIO())
+        self.blank.refresh_from_db()
+        self.filled.refresh_from_db()
+
+    def test_fills_only_blank_values(self):
+        self.run_command()
+        self.assertEqual(self.blank.meta_title, "Morning routines")
+        self.assertEqual(self.blank.meta_description, "Start slow. Drink water.")
+        self.assertEqual(self.filled.meta_title, "Custom title")
+        self.assertEqual(self.filled.meta_description, "Custom description")
+
+    def test_overwrite(self):
+        self.run_command("--overwrite")
+        self.assertEqual(self.filled.meta_title, "Evening routines")
+        self.assertEqual(self.filled.meta_description, "Wind down early.")
+
+    def test_dry_run_writes_nothing(self):
+        self.run_command("--dry-run", "--overwrite")
+        self.assertEqual(self.blank.meta_title, "")
+        self.assertEqual(self.blank.meta_description, "")
+        self.assertEqual(self.filled.meta_title, "Custom title")
+
+    def test_titles_only(self):
+        self.run_command("--titles-only")
+        self.assertEqual(self.blank.meta_title, "Morning routines")
+        self.assertEqual(self.blank.meta_description, "")
+
+
+class PostSlugTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Zest", slug="zest")
+
+    def make_post(self, title, **kwargs):
+        return Post.objects.create(title=title, category=self.category, **kwargs)
+
+    def test_duplicate_titles_get_a_suffix(self):
+        slugs = [self.make_post("Spring Reset").slug for _ in range(3)]
+        self.assertEqual(slugs, ["spring-reset", "spring-reset-2", "spring-reset-3"])
+
+    def test_invalid_slugs_are_found_in_the_database(self):
+        good = self.make_post("Good post")
+        wordpress = self.make_post("Imported", slug="?p=123")
+        spaced = self.make_post("Spaced", slug="has space")
+        found = set(invalid_slugs(Post.objects.all()).values_list("pk", flat=True))
+        self.assertEqual(found, {wordpress.pk, spaced.pk})
+        self.assertNotIn(good.pk, found)
+
+    def test_fix_wp_slugs_dry_run_proposes_distinct_slugs(self):
+        self.make_post("Summer Salad")
+        for number in (101, 102):
+            self.make_post("Summer Salad", slug=f"?p={number}")
+        out = StringIO()
+        call_command("fix_wp_slugs", "--dry-run", stdout=out)
+
+        proposed = re.findall(r"New slug: (\S+)", out.getvalue())
+        self.assertEqual(sorted(proposed), ["summer-salad-2", "summer-salad-3"])
+        self.assertEqual(
+            set(Post.objects.values_list("slug", flat=True)),
+            {"summer-salad", "?p=101", "?p=102"},
+        )
@@ -1,37 +1,48 @@
 from django.shortcuts import render, get_object_or_404
-from django.core.paginator import Paginator
-from .models import Post, Category
 from django.utils import timezone
+from zestizm.pagination import KeysetPaginator
+from .categories import category_registry
+from .models import Post
+
+POST_ORDERING = ("-publish_date", "-id")
 
 
 def blog_list(request):
-    # Get the current page number
-    page = request.GET.get("page", "1")  # Default to page 1 if not specified
+    # Cursor for the current page (empty on the first page)
+    cursor = request.GET.get("cursor")
 
     # Get all published regular posts (non-featured)
-    regular_posts = Post.objects.filter(
-        status="published", publish_date__lte=timezone.now(), is_featured=False
-    ).select_related("category")
+    # Cards show the stored excerpt, so the HTML body is never loaded
+    regular_posts = (
+        Post.objects.filter(
+            status="published", publish_date__lte=timezone.now(), is_featured=False
+        )
+        .select_related("category")
+        .defer("content")
+    )
 
     # Paginate regular posts
-    paginator = Paginator(regular_posts, 24)
-    regular_posts_page = paginator.get_page(page)
+    paginator = KeysetPaginator(
+        regular_posts, 24, POST_ORDERING, count_cache_key="blog:list:count"
+    )
+    regular_posts_page = paginator.get_page(cursor)
 
     # Only get featured posts if we're on page 1
     featured_posts = []
-    if page == "1" or not page:
+    if regular_posts_page.number == 1:
         featured_posts = (
             Post.objects.filter(
                 status="published", publish_date__lte=timezone.now(), is_featured=True
             )
             .select_related("category")
+            .defer("content")
             .order_by("-publish_date")[:4]
         )  # Limit to 4 featured posts
 
     context = {
         "featured_posts": featured_posts,
         "posts": regular_posts_page,
-        "categories": Category.objects.all(),
+        "categories": category_registry.all(),
         "title": "Blog",
         "meta_description": "Latest blog and updates from Zestizm",
     }
@@ -39,19 +50,23 @@ def blog_list(request):
 
 
 def category_list(request, slug):
-    category = get_object_or_404(Category, slug=slug)
+    category = category_registry.get_or_404(slug)
     posts = Post.objects.filter(
         category=category, status="published", publish_date__lte=timezone.now()
-    ).order_by("-publish_date")  # Add explicit ordering
+    ).defer("content")
 
-    paginator = Paginator(posts, 36)
-    page = request.GET.get("page")
-    posts = paginator.get_page(page)
+    paginator = KeysetPaginator(
+        posts,
+        36,
+        POST_ORDERING,
+        count_cache_key=f"blog:category:{category.pk}:count",
+    )
+    posts = paginator.get_page(request.GET.get("cursor"))
 
     context = {
         "category": category,
         "posts": posts,
-        "categories": Category.objects.all(),
+        "categories": category_registry.all(),
         "title": f"{category.name} - blog",
         "meta_description": f"Latest blog and updates about {category.name} from Djangify",
     }
@@ -91,7 +106,8 @@ def post_detail(request, slug):
             status="published", publish_date__lte=timezone.now(), category=post.category
         )
         .exclude(id=post.id)
-        .select_related("category")[:8]
+        .select_related("category")
+        .defer("content")[:8]
     )
 
     context = {
@@ -99,7 +115,7 @@ def post_detail(request, slug):
         "next_post": next_post,
         "previous_post": previous_post,
         "related_posts": related_posts,
-        "categories": Category.objects.all(),
+        "categories": category_registry.all(),
         "title": post.meta_title or post.title,
         "meta_description": post.get_meta_description,
         "meta_keywords": post.meta_keywords,
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Worker-shared state (registries, throttling, settings) needs one cache"""
+    if not isinstance(caches["default"], LocMemCache):
+        return []
+    return [
+        Warning(
+            "The default cache is process-local.",
+            hint=(
+                "Set CACHE_URL to a Redis, Memcached or database cache. "
+                "Otherwise category registry invalidations, cached settings "
+                "and login throttle counters stay in the worker that made "
+                "them, and each worker allows the full login rate."
+            ),
+            obj=settings.CACHES["default"]["BACKEND"],
+            id="core.W001",
+        )
+    ]
@@ -5,7 +5,7 @@ from django.contrib.sites.models import Site
 
 def homepage_settings(request):
     try:
-        settings = HomePageSettings.objects.first()
+        settings = HomePageSettings.load()
         social_links = []
         if settings:
             raw_links = [
@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from blog.categories import category_registry as blog_categories
+from blog.models import Category as BlogCategory, Post
+from .models import HomePageSettings
+
+# Blog category whose posts are suggested on the 404 page
+SUGGESTED_CATEGORY_SLUG = "zest"
+
+SUGGESTED_POSTS_KEY = "error_pages:404:suggested_posts"
+NOT_FOUND_BODY_KEY = "error_pages:404:body"
+
+# Upper bound on staleness, e.g. for posts scheduled with a future publish_date
+ERROR_PAGE_TIMEOUT = 60 * 60
+
+
+def get_suggested_posts():
+    """Return {"selected_category", "category_posts"} for the 404 page, cached"""
+    context = cache.get(SUGGESTED_POSTS_KEY)
+    if context is not None:
+        return context
+
+    # From the primary even inside a replica view: this is cached after the
+    # invalidation that a lagging replica may not have caught up with
+    published = (
+        Post.objects.using(DEFAULT_DB_ALIAS)
+        .filter(status="published", publish_date__lte=timezone.now())
+        .order_by("-publish_date")
+    )
+
+    category = blog_categories.get(SUGGESTED_CATEGORY_SLUG)
+    if category:
+        category_posts = list(published.filter(category=category)[:4])
+    else:
+        # Fallback to recent posts if category doesn't exist
+        category_posts = list(published[:3])
+
+    context = {"category_posts": category_posts, "selected_category": category}
+    cache.set(SUGGESTED_POSTS_KEY, context, ERROR_PAGE_TIMEOUT)
+    return context
+
+
+def get_cached_not_found_body():
+    return cache.get(NOT_FOUND_BODY_KEY)
+
+
+def cache_not_found_body(content):
+    cache.set(NOT_FOUND_BODY_KEY, content, ERROR_PAGE_TIMEOUT)
+
+
+def invalidate_error_pages():
+    cache.delete_many([SUGGESTED_POSTS_KEY, NOT_FOUND_BODY_KEY])
+
+
+@receiver([post_save, post_delete], sender=Post)
+@receiver([post_save, post_delete], sender=BlogCategory)
+@receiver(post_save, sender=HomePageSettings)
+def invalidate_on_content_change(sender, **kwargs):
+    invalidate_error_pages()
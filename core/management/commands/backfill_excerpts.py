@@ -0,0 +1,75 @@
+# core/management/commands/backfill_excerpts.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.models import Post
+from shop.models import Product
+
+# model label -> HTML fields the summary is built from
+SOURCES = {
+    "post": (Post, ("content",)),
+    "product": (Product, ("description", "long_description")),
+}
+
+
+class Command(BaseCommand):
+    help = "Fill the stored plain-text excerpt and word count on posts and products"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            choices=[*SOURCES, "all"],
+            default="all",
+            help="Which model to backfill (default: all)",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            dest="recompute",
+            help="Recompute every row, not only rows without an excerpt",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rows per fetch and per bulk update (default 500)",
+        )
+
+    def handle(self, *args, **options):
+        names = list(SOURCES) if options["model"] == "all" else [options["model"]]
+        for name in names:
+            model, fields = SOURCES[name]
+            start = time.perf_counter()
+            updated = self.backfill(
+                model, fields, options["recompute"], options["batch_size"]
+            )
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Updated {updated} {model._meta.verbose_name_plural} "
+                    f"in {elapsed:.2f}s ({updated / max(elapsed, 1e-9):,.0f}/s)"
+                )
+            )
+
+    def backfill(self, model, fields, recompute, batch_size):
+        queryset = model.objects.only("pk", "excerpt", "word_count", *fields)
+        if not recompute:
+            queryset = queryset.filter(excerpt="")
+        updated = 0
+        batch = []
+        # bulk_update skips save(), so `updated` timestamps are left alone
+        for obj in queryset.order_by("pk").iterator(chunk_size=batch_size):
+            before = (obj.excerpt, obj.word_count)
+            obj.update_summary()
+            if (obj.excerpt, obj.word_count) == before:
+                continue
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                model.objects.bulk_update(batch, ["excerpt", "word_count"])
+                updated += len(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ["excerpt", "word_count"])
+            updated += len(batch)
+        return updated
@@ -0,0 +1,225 @@
+# core/management/commands/benchmark.py
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext,
+    setup_test_environment,
+    teardown_test_environment,
+)
+from django.urls import reverse
+
+from blog.models import Post
+from core import perfdata
+from shop.models import Order, OrderItem, Product
+from zestizm.storage import secure_storage
+
+BENCH_FILE = "benchmark/sample.pdf"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the storefront hot paths on a throwaway database seeded "
+        "with a synthetic catalogue; writes JSON and compares with a baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1000)
+        parser.add_argument("--posts", type=int, default=20000)
+        parser.add_argument("--orders", type=int, default=100000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=30,
+            help="Timed requests per path (default: 30)",
+        )
+        parser.add_argument(
+            "--output",
+            default="benchmark.json",
+            help="Where to write the results (default: benchmark.json)",
+        )
+        parser.add_argument(
+            "--baseline", help="Earlier results file to compare against"
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            default=None,
+            help="Fail if any p95 is this many percent slower than the baseline",
+        )
+        parser.add_argument(
+            "--keepdb",
+            action="store_true",
+            help="Keep the benchmark database (and its seed data) between runs",
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options["keepdb"]
+        )
+        try:
+            counts = self.prepare(options)
+            results = self.run_paths(options["iterations"])
+        finally:
+            secure_storage.delete(BENCH_FILE)
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options["keepdb"]
+            )
+            teardown_test_environment()
+
+        report = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "database": connection.vendor,
+                "django": django.get_version(),
+                "python": platform.python_version(),
+                "iterations": options["iterations"],
+                "rows": counts,
+            },
+            "results": results,
+        }
+        with open(options["output"], "w") as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if options["baseline"]:
+            self.compare(results, options["baseline"], options["max_regression"])
+        self.stdout.write(self.style.SUCCESS("Benchmark complete"))
+
+    # -------------------------------
+    # Setup
+    # -------------------------------
+    def prepare(self, options):
+        if perfdata.is_seeded():
+            counts = {"shop.Product": Product.objects.count(), "reused": True}
+        else:
+            self.stdout.write("Seeding synthetic catalogue...")
+            start = time.perf_counter()
+            counts = perfdata.seed(
+                products=options["products"],
+                posts=options["posts"],
+                orders=options["orders"],
+                seed=options["seed"],
+            )
+            self.stdout.write(f"Seeded in {time.perf_counter() - start:.1f}s")
+
+        self.user = User.objects.filter(username="bench-shopper").first()
+        if self.user is None:
+            self.user = User.objects.create_user("bench-shopper", "bench@example.com")
+        self.product = Product.objects.filter(is_active=True).order_by("id").first()
+        self.post = Post.objects.filter(status="published").order_by("id").first()
+
+        # A real file so secure_download streams instead of raising 404
+        secure_storage.save(BENCH_FILE, ContentFile(b"%PDF-1.4\n" + b"0" * 4096))
+        Product.objects.filter(pk=self.product.pk).update(files=BENCH_FILE)
+        order = Order.objects.create(
+            user=self.user, email=self.user.email, paid=True, status="completed"
+        )
+        self.order_item = OrderItem.objects.create(
+            order=order,
+            product=self.product,
+            price_paid_pence=self.product.price_pence,
+            downloads_remaining=10**9,
+        )
+        return counts
+
+    def paths(self):
+        return {
+            "home": reverse("core:home"),
+            "product_detail": self.product.get_absolute_url(),
+            "blog_list": reverse("blog:list"),
+            "post_detail": self.post.get_absolute_url(),
+            "cart_detail": reverse("shop:cart_detail"),
+            "secure_download": reverse(
+                "shop:secure_download", args=[self.order_item.pk]
+            ),
+            "sitemap": reverse("sitemap"),
+        }
+
+    # -------------------------------
+    # Measurement
+    # -------------------------------
+    def request(self, client, url):
+        response = client.get(url)
+        if response.streaming:
+            b"".join(response.streaming_content)
+        response.close()
+        return response.status_code
+
+    def run_paths(self, iterations):
+        client = Client()
+        client.force_login(self.user)
+        client.post(reverse("shop:cart_add", args=[self.product.pk]))
+
+        results = {}
+        for name, url in self.paths().items():
+            status = self.request(client, url)  # warm caches and templates
+            timings = []
+            with CaptureQueriesContext(connection) as ctx:
+                self.request(client, url)
+            queries = len(ctx)
+            for _ in range(iterations):
+                start = time.perf_counter()
+                self.request(client, url)
+                timings.append((time.perf_counter() - start) * 1000)
+
+            tracemalloc.start()
+            self.request(client, url)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            results[name] = {
+                "url": url,
+                "status": status,
+                "p50_ms": round(statistics.median(timings), 3),
+                "p95_ms": round(percentile(timings, 0.95), 3),
+                "queries": queries,
+                "peak_kib": round(peak / 1024, 1),
+            }
+            self.stdout.write(
+                f"{name:<16} {status}  p50 {results[name]['p50_ms']:8.2f} ms  "
+                f"p95 {results[name]['p95_ms']:8.2f} ms  "
+                f"queries {queries:3d}  peak {results[name]['peak_kib']:8.1f} KiB"
+            )
+        return results
+
+    def compare(self, results, baseline_path, max_regression):
+        with open(baseline_path) as fh:
+            baseline = json.load(fh)["results"]
+
+        self.stdout.write(f"\nAgainst {baseline_path}:")
+        regressions = []
+        for name, current in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            change = (current["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+            self.stdout.write(
+                f"{name:<16} p95 {before['p95_ms']:8.2f} -> "
+                f"{current['p95_ms']:8.2f} ms ({change:+.1f}%)  "
+                f"queries {before['queries']} -> {current['queries']}"
+            )
+            if max_regression is not None and change > max_regression:
+                regressions.append(name)
+
+        if regressions:
+            raise CommandError(
+                f"p95 regressed more than {max_regression}%: {', '.join(regressions)}"
+            )
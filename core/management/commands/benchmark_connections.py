@@ -0,0 +1,129 @@
+# core/management/commands/benchmark_connections.py
+import json
+import statistics
+import time
+from copy import deepcopy
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.utils import load_backend
+
+from zestizm.db import apply_statement_timeout
+
+from .benchmark import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure per-request database connection overhead with fresh "
+        "connections, persistent connections and (PostgreSQL) a psycopg pool"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=200,
+            help="Simulated requests per mode (default: 200)",
+        )
+        parser.add_argument(
+            "--queries",
+            type=int,
+            default=1,
+            help="SELECT 1 round trips per simulated request (default: 1)",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=int,
+            default=5000,
+            help="statement_timeout each request asks for, in ms (0 to skip)",
+        )
+        parser.add_argument("--output", help="Write the results as JSON here")
+
+    def handle(self, *args, **options):
+        base = connections[options["database"]].settings_dict
+        modes = {
+            "fresh": {"CONN_MAX_AGE": 0},
+            "persistent": {"CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": True},
+        }
+        if base["ENGINE"] == "django.db.backends.postgresql":
+            modes["pool"] = {
+                "CONN_MAX_AGE": 0,
+                "OPTIONS": {"pool": {"min_size": 1, "max_size": 2}},
+            }
+        else:
+            self.stdout.write(f"{base['ENGINE']}: pooling needs PostgreSQL, skipped")
+
+        results = {}
+        for mode, overrides in modes.items():
+            results[mode] = self.run_mode(base, overrides, options)
+            result = results[mode]
+            self.stdout.write(
+                f"{mode:<11} p50 {result['p50_ms']:7.3f} ms  "
+                f"p95 {result['p95_ms']:7.3f} ms  "
+                f"mean {result['mean_ms']:7.3f} ms  "
+                f"connects {result['connects']}"
+            )
+
+        fresh = results["fresh"]["mean_ms"]
+        for mode in results:
+            if mode != "fresh" and results[mode]["mean_ms"]:
+                saved = fresh - results[mode]["mean_ms"]
+                self.stdout.write(
+                    f"{mode}: {saved:.3f} ms less per request than fresh "
+                    f"({fresh / results[mode]['mean_ms']:.1f}x)"
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(results, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS("Connection benchmark complete"))
+
+    def run_mode(self, base, overrides, options):
+        settings_dict = deepcopy(base)
+        for key, value in overrides.items():
+            if key == "OPTIONS":
+                settings_dict["OPTIONS"] = {**settings_dict["OPTIONS"], **value}
+            else:
+                settings_dict[key] = value
+        backend = load_backend(settings_dict["ENGINE"])
+        connection = backend.DatabaseWrapper(settings_dict, alias="benchmark")
+
+        connects = 0
+
+        def count(sender, **kwargs):
+            nonlocal connects
+            if kwargs["connection"] is connection:
+                connects += 1
+
+        connection_created.connect(count, weak=False)
+        timings = []
+        try:
+            for _ in range(options["iterations"]):
+                start = time.perf_counter()
+                # What request_started / request_finished do for each request
+                connection.close_if_unusable_or_obsolete()
+                if options["timeout"]:
+                    apply_statement_timeout(connection, options["timeout"])
+                with connection.cursor() as cursor:
+                    for _ in range(options["queries"]):
+                        cursor.execute("SELECT 1")
+                        cursor.fetchone()
+                connection.close_if_unusable_or_obsolete()
+                timings.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            raise CommandError(f"Could not benchmark {overrides}: {e}")
+        finally:
+            connection_created.disconnect(count)
+            connection.close()
+            if hasattr(connection, "close_pool"):
+                connection.close_pool()
+
+        return {
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(percentile(timings, 0.95), 3),
+            "mean_ms": round(statistics.fmean(timings), 3),
+            "connects": connects,
+        }
@@ -0,0 +1,92 @@
+# core/management/commands/seed_perf_data.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import perfdata
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generate a deterministic synthetic dataset (categories, products "
+        "with images, posts, users with profiles, orders and reviews) for "
+        "load testing"
+    )
+
+    def add_arguments(self, parser):
+        defaults = perfdata.DEFAULTS
+        parser.add_argument("--categories", type=int, default=defaults["categories"])
+        parser.add_argument("--products", type=int, default=defaults["products"])
+        parser.add_argument(
+            "--images",
+            default=defaults["images"],
+            help="Images per product as a range, e.g. 1-4",
+        )
+        parser.add_argument("--posts", type=int, default=defaults["posts"])
+        parser.add_argument(
+            "--paragraphs",
+            default=defaults["paragraphs"],
+            help="HTML paragraphs per post as a range, e.g. 4-12",
+        )
+        parser.add_argument("--users", type=int, default=defaults["users"])
+        parser.add_argument("--orders", type=int, default=defaults["orders"])
+        parser.add_argument(
+            "--items",
+            default=defaults["items"],
+            help="Distinct products per order as a range, e.g. 1-3",
+        )
+        parser.add_argument("--reviews", type=int, default=defaults["reviews"])
+        parser.add_argument(
+            "--ratings",
+            default=defaults["ratings"],
+            help="Review rating weights as rating:weight pairs",
+        )
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=defaults["skew"],
+            help="Zipf exponent for product popularity in orders (0 = uniform)",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=defaults["batch_size"]
+        )
+        parser.add_argument("--seed", type=int, default=defaults["seed"])
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete previously generated rows first",
+        )
+
+    def handle(self, *args, **options):
+        if options.pop("clear"):
+            self.stdout.write("Removing previous synthetic data...")
+            perfdata.clear()
+        elif perfdata.is_seeded():
+            raise CommandError(
+                "Synthetic data already exists; pass --clear to regenerate it"
+            )
+
+        for key in ("images", "paragraphs", "items"):
+            try:
+                perfdata.parse_range(options[key])
+            except ValueError:
+                raise CommandError(f"--{key} must look like 1-4")
+        if min(options["categories"], options["products"], options["users"]) < 1:
+            raise CommandError(
+                "--categories, --products and --users must be at least 1"
+            )
+
+        fields = perfdata.DEFAULTS.keys()
+        start = time.perf_counter()
+        counts = perfdata.seed(
+            log=self.stdout.write if options["verbosity"] > 1 else None,
+            **{key: options[key] for key in fields},
+        )
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {total} rows in {elapsed:.1f}s "
+                f"({total / max(elapsed, 1e-9):,.0f} rows/s)"
+            )
+        )
@@ -1,7 +1,15 @@
 # core/models.py
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from tinymce.models import HTMLField
 
+HOMEPAGE_SETTINGS_CACHE_KEY = "core:homepage_settings"
+# Saves clear the key only in the saving worker's cache unless the cache is
+# shared (CACHE_URL); this bounds how long other workers serve the old copy
+HOMEPAGE_SETTINGS_CACHE_TIMEOUT = 60 * 5
+
 
 class SupportRequest(models.Model):
     name = models.CharField(max_length=100)
@@ -182,6 +190,23 @@ class HomePageSettings(models.Model):
     def get_copyright(self):
         return self.copyright_text or f"© {self.business_name}. All rights reserved."
 
+    @classmethod
+    def load(cls):
+        """Return the singleton (or None), cached until saved or 5 minutes"""
+        settings = cache.get(HOMEPAGE_SETTINGS_CACHE_KEY)
+        if settings is None:
+            # Cache a sentinel for "no row" so that is cached too
+            settings = cls.objects.first() or False
+            cache.set(
+                HOMEPAGE_SETTINGS_CACHE_KEY, settings, HOMEPAGE_SETTINGS_CACHE_TIMEOUT
+            )
+        return settings or None
+
+
+@receiver([post_save, post_delete], sender=HomePageSettings)
+def clear_homepage_settings_cache(sender, **kwargs):
+    cache.delete(HOMEPAGE_SETTINGS_CACHE_KEY)
+
 
 class DashboardSettings(models.Model):
     """
@@ -0,0 +1,344 @@
+"""
+Synthetic data for benchmarks and load tests.
+
+Rows are generated deterministically from a seed and written with
+bulk_create in batches, never through model save(), so signals and per-row
+queries are skipped. Everything created here is prefixed with "perf" and can
+be removed with clear().
+"""
+
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from blog.models import Category as PostCategory, Post
+from shop.models import (
+    Category,
+    Order,
+    OrderItem,
+    Product,
+    ProductImage,
+    ProductReview,
+    Purchase,
+)
+
+PREFIX = "perf"
+PARAGRAPH_POOL = 500
+
+WORDS = (
+    "zest lemon planner recipe kitchen budget garden habit weekly journal "
+    "printable guide family meal prep organise simple healthy seasonal home "
+    "notes tracker checklist bundle starter bright fresh calm clever"
+).split()
+
+DEFAULTS = {
+    "categories": 10,
+    "products": 1000,
+    "images": "1-4",
+    "posts": 20000,
+    "paragraphs": "4-12",
+    "users": 1000,
+    "orders": 100000,
+    "items": "1-3",
+    "reviews": 5000,
+    "ratings": "1:1,2:1,3:2,4:4,5:6",
+    "skew": 1.0,
+    "batch_size": 2000,
+    "seed": 42,
+}
+
+
+# -------------------------------
+# Distributions
+# -------------------------------
+def parse_range(spec):
+    """'1-4' -> (1, 4); '3' -> (3, 3)"""
+    low, _, high = str(spec).partition("-")
+    low = int(low)
+    high = int(high) if high else low
+    if low < 0 or high < low:
+        raise ValueError(f"Invalid range {spec!r}")
+    return low, high
+
+
+def parse_weights(spec):
+    """'1:1,5:6' -> ([1, 5], [1.0, 6.0])"""
+    values, weights = [], []
+    for part in str(spec).split(","):
+        value, _, weight = part.partition(":")
+        values.append(int(value))
+        weights.append(float(weight or 1))
+    return values, weights
+
+
+def zipf_weights(count, skew):
+    """Cumulative weights where item i is picked ~1/(i+1)**skew as often"""
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(count)))
+
+
+class Generator:
+    def __init__(self, options, log=None):
+        given = {key: value for key, value in options.items() if value is not None}
+        self.options = {**DEFAULTS, **given}
+        self.rng = random.Random(self.options["seed"])
+        self.batch_size = self.options["batch_size"]
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.counts = {}
+        # Text is drawn from a fixed pool: building fresh sentences for every
+        # row costs more than inserting it
+        self.paragraphs = [
+            "<p>" + " ".join(self.sentence() for _ in range(4)) + "</p>"
+            for _ in range(PARAGRAPH_POOL)
+        ]
+
+    # -------------------------------
+    # Helpers
+    # -------------------------------
+    def sentence(self, words=12):
+        return " ".join(self.rng.choices(WORDS, k=words)).capitalize() + "."
+
+    def html(self, paragraphs):
+        return "".join(self.rng.choices(self.paragraphs, k=paragraphs))
+
+    def randint(self, spec):
+        return self.rng.randint(*parse_range(spec))
+
+    def write(self, model, rows, **kwargs):
+        """bulk_create an iterable in batches, each in its own transaction"""
+        created = []
+        batch = []
+        total = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                total += self._flush(model, batch, created, **kwargs)
+                batch = []
+        if batch:
+            total += self._flush(model, batch, created, **kwargs)
+        label = model._meta.label
+        self.counts[label] = self.counts.get(label, 0) + total
+        self.log(f"{label}: {total}")
+        return created
+
+    def _flush(self, model, batch, created, keep=False, **kwargs):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, **kwargs)
+        if keep:
+            created.extend(batch)
+        return len(batch)
+
+    # -------------------------------
+    # Models
+    # -------------------------------
+    def run(self):
+        opts = self.options
+        categories = self.write(
+            Category,
+            (
+                Category(name=f"Perf {i}", slug=f"{PREFIX}-{i}")
+                for i in range(opts["categories"])
+            ),
+            keep=True,
+        )
+        post_categories = self.write(
+            PostCategory,
+            (
+                PostCategory(name=f"Perf {i}", slug=f"{PREFIX}-{i}")
+                for i in range(opts["categories"])
+            ),
+            keep=True,
+        )
+        products = self.products(categories)
+        self.write(ProductImage, self.images(products))
+        self.write(Post, self.posts(post_categories))
+        user_ids = self.users()
+        self.orders(products, user_ids)
+        self.write(ProductReview, self.reviews(products, user_ids))
+        return self.counts
+
+    def products(self, categories):
+        rows = self.write(
+            Product,
+            (self.product(i, categories) for i in range(self.options["products"])),
+            keep=True,
+        )
+        # Only ids and prices are needed from here on
+        return [(product.pk, product.price_pence) for product in rows]
+
+    def product(self, i, categories):
+        product = Product(
+            title=f"Perf product {i}",
+            slug=f"{PREFIX}-product-{i}",
+            public_id=f"{PREFIX}-product-{i}",
+            category=self.rng.choice(categories),
+            description=self.html(2),
+            long_description=self.html(6),
+            price_pence=self.rng.randrange(199, 4999),
+            status="publish",
+            is_active=True,
+            featured=i < 2,
+            order=self.rng.randrange(0, 10),
+        )
+        # bulk_create skips save(), which normally maintains these
+        product.update_summary()
+        return product
+
+    def images(self, products):
+        for product_id, _ in products:
+            for position in range(self.randint(self.options["images"])):
+                yield ProductImage(
+                    product_id=product_id,
+                    image=f"products/{PREFIX}/{product_id}-{position}.jpg",
+                    alt_text="Product image",
+                    is_primary=position == 0,
+                    order=position,
+                )
+
+    def posts(self, categories):
+        for i in range(self.options["posts"]):
+            post = Post(
+                title=f"Perf post {i}",
+                slug=f"{PREFIX}-post-{i}",
+                content=self.html(self.randint(self.options["paragraphs"])),
+                category=self.rng.choice(categories),
+                status="published",
+                publish_date=self.now - timedelta(minutes=i * 7 + 1),
+            )
+            post.update_summary()
+            yield post
+
+    def users(self):
+        password = make_password(None)
+        users = self.write(
+            User,
+            (
+                User(
+                    username=f"{PREFIX}-user-{i}",
+                    email=f"{PREFIX}-user-{i}@example.com",
+                    password=password,
+                )
+                for i in range(self.options["users"])
+            ),
+            keep=True,
+        )
+        user_ids = [user.pk for user in users]
+        if None in user_ids:
+            # Backends that don't return ids from bulk inserts
+            user_ids = list(
+                User.objects.filter(username__startswith=f"{PREFIX}-user-")
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+        self.write(
+            UserProfile,
+            (UserProfile(user_id=user_id, verified=True) for user_id in user_ids),
+        )
+        return user_ids
+
+    def orders(self, products, user_ids):
+        """Orders, their items and the Purchase index, one batch at a time"""
+        opts = self.options
+        cum_weights = zipf_weights(len(products), opts["skew"])
+        orders = items = 0
+        for start in range(0, opts["orders"], self.batch_size):
+            batch = [
+                Order(
+                    order_id=f"ORD-{PREFIX.upper()}{i:09d}",
+                    user_id=self.rng.choice(user_ids),
+                    email="buyer@example.com",
+                    paid=True,
+                    status="completed",
+                    payment_intent_id=f"pi_{PREFIX}_{i}",
+                )
+                for i in range(start, min(start + self.batch_size, opts["orders"]))
+            ]
+            with transaction.atomic():
+                Order.objects.bulk_create(batch)
+                if not connection.features.can_return_rows_from_bulk_insert:
+                    ids = dict(
+                        Order.objects.filter(
+                            order_id__in=[order.order_id for order in batch]
+                        ).values_list("order_id", "id")
+                    )
+                    for order in batch:
+                        order.pk = ids[order.order_id]
+
+                order_items = []
+                for order in batch:
+                    count = min(self.randint(opts["items"]), len(products))
+                    picked = {
+                        products[index]
+                        for index in self.rng.choices(
+                            range(len(products)), cum_weights=cum_weights, k=count
+                        )
+                    }
+                    order_items += [
+                        OrderItem(
+                            order_id=order.pk,
+                            product_id=product_id,
+                            price_paid_pence=price,
+                        )
+                        for product_id, price in sorted(picked)
+                    ]
+                OrderItem.objects.bulk_create(order_items)
+                buyer = {order.pk: order.user_id for order in batch}
+                Purchase.objects.bulk_create(
+                    [
+                        Purchase(
+                            user_id=buyer[item.order_id], product_id=item.product_id
+                        )
+                        for item in order_items
+                    ],
+                    ignore_conflicts=True,
+                )
+            orders += len(batch)
+            items += len(order_items)
+        self.counts["shop.Order"] = orders
+        self.counts["shop.OrderItem"] = items
+        self.log(f"shop.Order: {orders} ({items} items)")
+
+    def reviews(self, products, user_ids):
+        values, weights = parse_weights(self.options["ratings"])
+        wanted = min(self.options["reviews"], len(products) * len(user_ids))
+        seen = set()
+        while len(seen) < wanted:
+            pair = (self.rng.choice(products)[0], self.rng.choice(user_ids))
+            if pair in seen:
+                continue
+            seen.add(pair)
+            yield ProductReview(
+                product_id=pair[0],
+                user_id=pair[1],
+                rating=self.rng.choices(values, weights)[0],
+                comment=self.sentence(20),
+                verified_purchase=True,
+            )
+
+
+# -------------------------------
+# Entry points
+# -------------------------------
+def is_seeded():
+    return Product.objects.filter(slug__startswith=f"{PREFIX}-product-").exists()
+
+
+def seed(log=None, **options):
+    """Generate a dataset; returns row counts per model label"""
+    return Generator(options, log).run()
+
+
+def clear():
+    """Remove everything seed() created"""
+    Order.objects.filter(order_id__startswith=f"ORD-{PREFIX.upper()}").delete()
+    User.objects.filter(username__startswith=f"{PREFIX}-user-").delete()
+    Post.objects.filter(slug__startswith=f"{PREFIX}-post-").delete()
+    Product.objects.filter(slug__startswith=f"{PREFIX}-product-").delete()
+    Category.objects.filter(slug__startswith=f"{PREFIX}-").delete()
+    PostCategory.objects.filter(slug__startswith=f"{PREFIX}-").delete()
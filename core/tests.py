@@ -1,3 +1,470 @@
-from django.test import TestCase
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import TestResult, TestSuite, mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+
+from blog.categories import category_registry
+from blog.models import Category, Post
+from core.error_pages import (
+    NOT_FOUND_BODY_KEY,
+    SUGGESTED_POSTS_KEY,
+    cache_not_found_body,
+)
+from core.models import HomePageSettings
+from zestizm.db import (
+    ReplicaRouter,
+    reset_replica_state,
+    reset_statement_timeout,
+    start_replica_reads,
+    statement_timeout,
+    wrote_in_request,
+)
+from zestizm.metrics import (
+    InstrumentedLocMemCache,
+    finish_request,
+    metrics,
+    start_request,
+)
+from zestizm.middleware import (
+    BlocklistMiddleware,
+    MetricsMiddleware,
+    ReplicaMiddleware,
+    StatementTimeoutMiddleware,
+    get_blocked_hits,
+)
+from zestizm.nplusone import NPlusOneError, NPlusOneTestMixin
+
+
+class CacheMetricsTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = InstrumentedLocMemCache("metrics-tests", {})
+        self.cache.set("present", 1)
+        self.stats = start_request()
+        self.addCleanup(finish_request)
+
+    def test_get_many_counts_each_key_once(self):
+        self.assertEqual(self.cache.get_many(["present", "absent"]), {"present": 1})
+        self.assertEqual((self.stats.cache_hits, self.stats.cache_misses), (1, 1))
+
+    def test_get(self):
+        self.assertEqual(self.cache.get("present"), 1)
+        self.assertEqual(self.cache.get("absent", "default"), "default")
+        self.assertEqual((self.stats.cache_hits, self.stats.cache_misses), (1, 1))
+
+
+@override_settings(METRICS_TOKEN="s3cret")
+class MetricsViewTests(TestCase):
+    def test_refused_without_staff_or_token(self):
+        user = User.objects.create_user("member", "member@example.com", "pw")
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong")
+        self.assertEqual(response.status_code, 403)
+        self.client.force_login(user)
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+    def test_bearer_token(self):
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8"
+        )
+
+    def test_staff(self):
+        staff = User.objects.create_user("staff", "staff@example.com", "pw")
+        staff.is_staff = True
+        staff.save()
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get("/metrics").status_code, 200)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_no_token_configured_refuses_empty_bearer(self):
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer ")
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(METRICS_SAMPLE_RATE=1.0, METRICS_TOKEN="s3cret")
+class MetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_request_is_recorded(self):
+        self.client.get("/robots.txt")
+        output = self.client.get(
+            "/metrics", HTTP_AUTHORIZATION="Bearer s3cret"
+        ).content.decode()
+        self.assertIn("# TYPE zestizm_request_duration_seconds histogram", output)
+        self.assertIn(
+            'zestizm_request_duration_seconds_count{view="robots_txt"} 1', output
+        )
+        self.assertIn(
+            'zestizm_requests_total{status="200",view="robots_txt"} 1', output
+        )
+        # The scrape itself isn't measured
+        self.assertNotIn('view="metrics"', output)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unused_when_not_sampling(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            MetricsMiddleware(reading_view)
+
+
+class BlocklistMiddlewareTests(TestCase):
+    def setUp(self):
+        self.middleware = BlocklistMiddleware(lambda request: HttpResponse("ok"))
+
+    def get(self, path, **extra):
+        return self.middleware(RequestFactory().get(path, **extra))
+
+    def test_scanner_paths_are_blocked(self):
+        for path in [
+            "/wp-admin/",
+            "/blog/wp-login.php",
+            "/index.php",
+            "/.env",
+            "/.git/config",
+            "/wp-content/plugins/x.js",
+        ]:
+            with self.subTest(path=path):
+                response = self.get(path)
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.content, b"Not Found")
+
+    def test_similar_paths_pass_through(self):
+        for path in [
+            "/blog/wp-admin-tips/",
+            "/blog/why-php-still-matters/",
+            "/blog/.envy/",
+            "/shop/the-xmlrpc-guide/",
+            "/blog/gitignore/",
+        ]:
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path).content, b"ok")
+
+    def test_scanner_user_agent_is_blocked(self):
+        response = self.get("/", HTTP_USER_AGENT="sqlmap/1.7")
+        self.assertEqual(response.status_code, 404)
+
+    def test_blocked_request_skips_the_stack_and_is_counted(self):
+        before = get_blocked_hits().get("path", 0)
+        with self.assertNumQueries(0):
+            response = self.client.get("/wp-login.php")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.content, b"Not Found")
+        self.assertNotIn("sessionid", response.cookies)
+        self.assertEqual(get_blocked_hits()["path"], before + 1)
+
+
+class NotFoundPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Zest", slug="zest")
+
+    def setUp(self):
+        cache.clear()
+        category_registry._version = None
+
+    def test_second_anonymous_404_reuses_the_cached_body(self):
+        first = self.client.get("/no-such-page/")
+        self.assertEqual(first.status_code, 404)
+        with self.assertNumQueries(0):
+            second = self.client.get("/another-missing-page/")
+        self.assertEqual(second.status_code, 404)
+        self.assertTemplateNotUsed(second, "error/404.html")
+        self.assertEqual(second.content, first.content)
+
+    def test_authenticated_users_get_a_fresh_render(self):
+        cache_not_found_body(b"anonymous copy")
+        user = User.objects.create_user("member", "member@example.com", "pw")
+        self.client.force_login(user)
+        response = self.client.get("/no-such-page/")
+        self.assertEqual(response.status_code, 404)
+        self.assertTemplateUsed(response, "error/404.html")
+        self.assertNotEqual(response.content, b"anonymous copy")
+
+    def test_publishing_a_post_refreshes_the_suggestions(self):
+        self.assertNotContains(
+            self.client.get("/no-such-page/"), "Fresh zest", status_code=404
+        )
+        Post.objects.create(
+            title="Fresh zest", category=self.category, status="published"
+        )
+        self.assertContains(
+            self.client.get("/no-such-page/"), "Fresh zest", status_code=404
+        )
+
+    def test_content_saves_invalidate_the_cached_page(self):
+        saves = [
+            lambda: Post.objects.create(title="Draft", category=self.category),
+            lambda: Category.objects.create(name="Calm", slug="calm"),
+            lambda: HomePageSettings.objects.create(),
+        ]
+        for save in saves:
+            cache.set_many({SUGGESTED_POSTS_KEY: {}, NOT_FOUND_BODY_KEY: b"old"})
+            save()
+            self.assertIsNone(cache.get(SUGGESTED_POSTS_KEY))
+            self.assertIsNone(cache.get(NOT_FOUND_BODY_KEY))
+
+
+class FakePostgresConnection:
+    """Records the statement_timeout values sent to the server"""
+
+    vendor = "postgresql"
+
+    def __init__(self):
+        self.connection = None
+        self.sent = []
+
+    @contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql, params):
+        self.sent.append(int(params[0]))
+
+    def connect(self):
+        self.connection = object()
+        reset_statement_timeout(sender=None, connection=self)
+
+
+@statement_timeout("batch")
+def batch_view(request):
+    return HttpResponse()
+
+
+@override_settings(STATEMENT_TIMEOUTS={"default": 5000, "batch": 60000})
+class StatementTimeoutMiddlewareTests(SimpleTestCase):
+    def run_request(self, connection, view, before_view=None):
+        def get_response(request):
+            if before_view:
+                before_view()
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        fake_connections = SimpleNamespace(all=lambda: [connection])
+        with mock.patch("zestizm.middleware.connections", fake_connections):
+            middleware = StatementTimeoutMiddleware(get_response)
+            middleware(RequestFactory().get("/"))
+
+    def test_connection_opened_before_the_view_gets_the_default(self):
+        connection = FakePostgresConnection()
+        self.run_request(connection, batch_view, before_view=connection.connect)
+        self.assertEqual(connection.sent, [5000, 60000])
+
+    def test_persistent_connection_returns_to_the_default(self):
+        connection = FakePostgresConnection()
+        self.run_request(connection, batch_view, before_view=connection.connect)
+        sent_before_view = []
+        self.run_request(
+            connection,
+            reading_view,
+            before_view=lambda: sent_before_view.extend(connection.sent),
+        )
+        self.assertEqual(sent_before_view, [5000, 60000, 5000])
+        # Already at the default, so the view needs nothing more
+        self.assertEqual(connection.sent, [5000, 60000, 5000])
+
+    def test_unused_connections_are_not_opened(self):
+        connection = FakePostgresConnection()
+        self.run_request(connection, reading_view)
+        self.assertIsNone(connection.connection)
+        self.assertEqual(connection.sent, [])
+
+    def test_unused_without_postgresql(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            StatementTimeoutMiddleware(reading_view)
+
+
+def reading_view(request):
+    return HttpResponse(ReplicaRouter().db_for_read(Post) or "default")
+
+
+def writing_view(request):
+    ReplicaRouter().db_for_write(Post)
+    return reading_view(request)
+
+
+@override_settings(
+    REPLICA_DATABASES=["replica_1"],
+    REPLICA_APPS=["blog"],
+    REPLICA_UNPINNED_APPS=["sessions"],
+)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        reset_replica_state()
+        self.addCleanup(reset_replica_state)
+
+    def test_reads_use_the_primary_unless_opened(self):
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_replica_reads_are_limited_to_replica_apps(self):
+        start_replica_reads()
+        self.assertEqual(self.router.db_for_read(Post), "replica_1")
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_a_write_returns_later_reads_to_the_primary(self):
+        start_replica_reads()
+        self.assertEqual(self.router.db_for_write(Post), "default")
+        self.assertTrue(wrote_in_request())
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_session_writes_do_not_pin(self):
+        start_replica_reads()
+        self.router.db_for_write(Session)
+        self.assertFalse(wrote_in_request())
+        self.assertEqual(self.router.db_for_read(Post), "replica_1")
+
+
+@override_settings(REPLICA_DATABASES=["replica_1"], REPLICA_APPS=["blog"])
+class ReplicaRouterTransactionTests(TestCase):
+    def test_reads_inside_a_primary_transaction_stay_on_the_primary(self):
+        # TestCase holds a transaction open on default for every test
+        start_replica_reads()
+        self.addCleanup(reset_replica_state)
+        self.assertIsNone(ReplicaRouter().db_for_read(Post))
+
+
+@override_settings(
+    REPLICA_DATABASES=["replica_1"],
+    REPLICA_APPS=["blog"],
+    REPLICA_VIEWS=["core.tests.reading_view", "core.tests.writing_view"],
+    REPLICA_STICKY_SECONDS=10,
+)
+class ReplicaMiddlewareTests(SimpleTestCase):
+    def run_view(self, view, method="get", cookies=None):
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaMiddleware(get_response)
+        request = getattr(RequestFactory(), method)("/")
+        request.COOKIES.update(cookies or {})
+        return middleware(request)
+
+    def test_listed_get_reads_from_a_replica(self):
+        response = self.run_view(reading_view)
+        self.assertEqual(response.content, b"replica_1")
+        self.assertNotIn("primary_reads", response.cookies)
+
+    def test_post_reads_from_the_primary(self):
+        self.assertEqual(self.run_view(reading_view, "post").content, b"default")
+
+    @override_settings(REPLICA_VIEWS=["core.views.home"])
+    def test_unlisted_view_reads_from_the_primary(self):
+        self.assertEqual(self.run_view(reading_view).content, b"default")
+
+    def test_write_sets_the_sticky_cookie(self):
+        response = self.run_view(writing_view)
+        self.assertEqual(response.content, b"default")
+        self.assertEqual(response.cookies["primary_reads"]["max-age"], 10)
+        # State doesn't leak into the next request on this thread
+        self.assertFalse(wrote_in_request())
+
+    def test_sticky_cookie_keeps_reads_on_the_primary(self):
+        response = self.run_view(reading_view, cookies={"primary_reads": "1"})
+        self.assertEqual(response.content, b"default")
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_unused_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaMiddleware(reading_view)
+
+
+@skipUnless(
+    "replica_1" in settings.DATABASES, "needs a replica_1 alias (DATABASE_REPLICA_URLS)"
+)
+class ReplicaMirrorTests(TransactionTestCase):
+    """
+    End to end against replica_1, which mirrors default in tests. The rows
+    must be committed for the mirror's separate connection to see them.
+    """
+
+    databases = "__all__"
+
+    def setUp(self):
+        category = Category.objects.create(name="Zest", slug="zest")
+        self.post = Post.objects.create(
+            title="Mirrored", category=category, status="published"
+        )
+        cache.clear()
+        category_registry._version = None
+
+    def test_blog_reads_go_to_the_replica_and_categories_to_the_primary(self):
+        with (
+            CaptureQueriesContext(connections["default"]) as primary,
+            CaptureQueriesContext(connections["replica_1"]) as replica,
+        ):
+            response = self.client.get(self.post.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        replica_sql = " ".join(query["sql"] for query in replica.captured_queries)
+        primary_sql = " ".join(query["sql"] for query in primary.captured_queries)
+        self.assertIn('"blog_post"', replica_sql)
+        self.assertIn('"blog_category"', primary_sql)
+
+
+def post_titles_view(request):
+    titles = Post.objects.values_list("title", flat=True)
+    return HttpResponse(", ".join(titles))
+
+
+def post_categories_view(request):
+    # One category query per post
+    names = [post.category.name for post in Post.objects.all()]
+    return HttpResponse(", ".join(names))
+
+
+urlpatterns = [
+    path("titles/", post_titles_view),
+    path("categories/", post_categories_view),
+]
+
+
+@override_settings(ROOT_URLCONF="core.tests")
+class NPlusOneTestMixinTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Zest", slug="zest")
+        for index in range(3):
+            Post.objects.create(title=f"Post {index}", category=category)
+
+    def run_watched(self, *paths):
+        class Watched(NPlusOneTestMixin, TestCase):
+            nplusone_fail = True
+
+            def test_requests(self):
+                for path in paths:
+                    self.assertEqual(self.client.get(path).status_code, 200)
+
+        result = TestResult()
+        TestSuite([Watched("test_requests")]).run(result)
+        return result
+
+    def test_repeating_clean_requests_pass(self):
+        # The same SELECT runs once per request, three times in the test
+        result = self.run_watched("/titles/", "/titles/", "/titles/")
+        self.assertEqual((result.errors, result.failures), ([], []))
+
+    def test_n_plus_one_inside_one_request_fails(self):
+        result = self.run_watched("/titles/", "/categories/", "/titles/")
+        self.assertEqual(len(result.failures), 1)
+        message = result.failures[0][1]
+        self.assertIn(NPlusOneError.__name__, message)
+        self.assertIn("/categories/:", message)
+        self.assertNotIn("/titles/:", message)
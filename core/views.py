@@ -1,20 +1,27 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, Http404
+from django.shortcuts import render, redirect
+from django.http import HttpResponse
 from django.utils import timezone
 from django.views.decorators.http import require_GET
 from django.contrib import messages
-from django.core.paginator import Paginator
+from django.contrib.messages import get_messages
 from django.db.models import Q
 
 # --- Import models ---
 # Blog models (for blog section)
-from blog.models import Post, Category as BlogCategory
+from blog.models import Post
 
 # Shop models (for product listings)
-from shop.models import Product, Category as ProductCategory
+from shop.models import Product, owned_product_ids
+from shop.categories import category_registry as product_categories
+from accounts.models import favourite_product_ids
 
 # --- Forms ---
 from .forms import SupportForm
+from .error_pages import (
+    cache_not_found_body,
+    get_cached_not_found_body,
+    get_suggested_posts,
+)
 
 
 def home(request):
@@ -35,7 +42,7 @@ def home(request):
     category_slug = request.GET.get("category")
     current_category = None
     if category_slug:
-        current_category = get_object_or_404(ProductCategory, slug=category_slug)
+        current_category = product_categories.get_or_404(category_slug)
         base_products = base_products.filter(category=current_category)
 
     # --- Handle search query ---
@@ -48,29 +55,16 @@ def home(request):
     # -------------------------------
     # 2. Product Sections
     # -------------------------------
-    categories = ProductCategory.objects.all()
+    categories = product_categories.all()
 
     # Latest 4 products
-    latest_products = base_products[:4]
-    latest_ids = latest_products.values_list("id", flat=True)
+    latest_products = base_products.with_review_stats()[:4]
 
     # Featured products (2 max)
     featured_products = Product.objects.filter(
         featured=True, is_active=True, status="publish"
-    ).order_by("order", "-created")[:2]
-    featured_ids = featured_products.values_list("id", flat=True)
-
-    # Additional products (remaining)
-    additional_products = (
-        base_products.exclude(id__in=latest_ids)
-        .exclude(id__in=featured_ids)
-        .order_by("-created")
-    )
-
-    # Optional pagination for the additional section
-    paginator = Paginator(additional_products, 8)
-    page = request.GET.get("page")
-    products_page = paginator.get_page(page)
+    ).order_by("order", "-created")
+    featured_products = featured_products.with_review_stats()[:2]
 
     # -------------------------------
     # 3. Blog Posts (from BlogCategory)
@@ -78,9 +72,17 @@ def home(request):
     blog_posts = (
         Post.objects.filter(status="published", publish_date__lte=timezone.now())
         .select_related("category")
+        .defer("content")
         .order_by("-publish_date")[:3]
     )
 
+    # Heart state for every product card on the page, in one query
+    latest_products = list(latest_products)
+    featured_products = list(featured_products)
+    favourite_ids = favourite_product_ids(
+        request.user, [*latest_products, *featured_products]
+    )
+
     # -------------------------------
     # 4. Context
     # -------------------------------
@@ -89,7 +91,8 @@ def home(request):
         "current_category": current_category,  # active filter
         "latest_products": latest_products,
         "featured_products": featured_products,
-        "additional_products": products_page,
+        "favourite_ids": favourite_ids,
+        "owned_ids": owned_product_ids(request.user),
         "blog_posts": blog_posts,
         "query": query,  # search term
     }
@@ -106,28 +109,21 @@ def handler403(request, exception):
 
 
 def handler404(request, exception):
-    # Define which category to show (by slug)
-    category_slug = "zest"  # Change this to your desired category slug
-
-    try:
-        # Try to get the category
-        category = get_object_or_404(BlogCategory, slug=category_slug)
-
-        # Get posts from the category
-        category_posts = Post.objects.filter(
-            category=category, status="published", publish_date__lte=timezone.now()
-        ).order_by("-publish_date")[:4]
-
-    except Http404:
-        # Fallback to recent posts if category doesn't exist
-        category_posts = Post.objects.filter(
-            status="published", publish_date__lte=timezone.now()
-        ).order_by("-publish_date")[:3]
-        category = None
-
-    context = {"category_posts": category_posts, "selected_category": category}
-
-    return render(request, "error/404.html", context, status=404)
+    # Anonymous visitors with no pending messages all see the same page,
+    # so reuse one rendered body for them (bots generate most 404s)
+    user = getattr(request, "user", None)
+    shareable = not (user and user.is_authenticated) and not len(
+        get_messages(request)
+    )
+    if shareable:
+        body = get_cached_not_found_body()
+        if body is not None:
+            return HttpResponse(body, status=404)
+
+    response = render(request, "error/404.html", get_suggested_posts(), status=404)
+    if shareable:
+        cache_not_found_body(response.content)
+    return response
 
 
 def support(request):
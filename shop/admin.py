@@ -12,6 +12,7 @@ from .models import (
     OrderItem,
     ProductReview,
     Purchase,
+    StripeEvent,
 )
 from django import forms
 
@@ -251,6 +252,22 @@ class OrderAdmin(admin.ModelAdmin):
 admin.site.register(Purchase)
 
 
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ["event_id", "event_type", "status", "attempts", "received_at"]
+    list_filter = ["status", "event_type"]
+    search_fields = ["event_id"]
+    readonly_fields = ["event_id", "event_type", "payload", "received_at"]
+    actions = ["replay"]
+
+    @admin.action(description="Replay selected events")
+    def replay(self, request, queryset):
+        queued = queryset.update(
+            status="pending", attempts=0, last_error="", next_attempt_at=None
+        )
+        self.message_user(request, f"{queued} events queued for processing.")
+
+
 class ProductReviewAdminForm(forms.ModelForm):
     # Use a DIFFERENT name than the model field to avoid Django's
     # "non-editable field" check.
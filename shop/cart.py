@@ -1,3 +1,5 @@
+import hashlib
+import json
 from decimal import Decimal
 from django.conf import settings
 from .models import Product
@@ -69,6 +71,11 @@ class Cart:
             for item in self.cart.values()
         )
 
+    def fingerprint(self):
+        """Hash of the cart contents (product ids, quantities and prices)"""
+        data = json.dumps(self.cart, sort_keys=True)
+        return hashlib.sha256(data.encode()).hexdigest()
+
     def clear(self):
         """Remove cart from session"""
         del self.session[settings.CART_SESSION_ID]
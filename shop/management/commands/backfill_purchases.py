@@ -0,0 +1,40 @@
+# shop/management/commands/backfill_purchases.py
+from django.core.management.base import BaseCommand
+from shop.models import OrderItem, Purchase
+
+
+class Command(BaseCommand):
+    help = "Fills the Purchase ownership index from completed orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Rows to insert per query (default 1000)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        pairs = (
+            OrderItem.objects.filter(
+                order__status="completed", order__user__isnull=False
+            )
+            .values_list("order__user_id", "product_id")
+            .distinct()
+        )
+
+        before = Purchase.objects.count()
+        batch = []
+        for user_id, product_id in pairs.iterator(chunk_size=batch_size):
+            batch.append(Purchase(user_id=user_id, product_id=product_id))
+            if len(batch) >= batch_size:
+                Purchase.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            Purchase.objects.bulk_create(batch, ignore_conflicts=True)
+
+        created = Purchase.objects.count() - before
+        self.stdout.write(
+            self.style.SUCCESS(f"Backfilled {created} purchase records")
+        )
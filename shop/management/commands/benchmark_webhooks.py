@@ -0,0 +1,127 @@
+# shop/management/commands/benchmark_webhooks.py
+import hashlib
+import hmac
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+from shop.models import Order, OrderItem, Product, StripeEvent
+from shop.webhooks import process_pending_events
+
+
+class _Rollback(Exception):
+    pass
+
+
+def sign(payload, secret, timestamp):
+    """Stripe-Signature header for `payload`, as Stripe would send it"""
+    signed = f"{timestamp}.{payload}".encode()
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+class Command(BaseCommand):
+    help = "Measure webhook ingest and worker throughput on a synthetic event burst"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--events",
+            type=int,
+            default=200,
+            help="Distinct payment_intent.succeeded events (default 200)",
+        )
+        parser.add_argument(
+            "--duplicates",
+            type=float,
+            default=0.2,
+            help="Share of events delivered a second time (default 0.2)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Worker batch size (default 50)",
+        )
+
+    def handle(self, *args, **options):
+        product = Product.objects.filter(is_active=True).first()
+        if product is None:
+            raise CommandError("Needs at least one active product")
+
+        # Orders, events and counters are rolled back at the end; emails are
+        # queued with on_commit, so none are sent either.
+        try:
+            with transaction.atomic():
+                deliveries = self.build_burst(product, options)
+                self.run(deliveries, options["batch_size"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def build_burst(self, product, options):
+        suffix = uuid.uuid4().hex[:8]
+        user = User.objects.create_user(f"bench-{suffix}", f"bench-{suffix}@example.com")
+        deliveries = []
+        for i in range(options["events"]):
+            intent_id = f"pi_bench_{suffix}_{i}"
+            order = Order.objects.create(
+                user=user, email=user.email, payment_intent_id=intent_id
+            )
+            OrderItem.objects.create(
+                order=order, product=product, price_paid_pence=product.price_pence
+            )
+            deliveries.append(
+                json.dumps(
+                    {
+                        "id": f"evt_bench_{suffix}_{i}",
+                        "object": "event",
+                        "type": "payment_intent.succeeded",
+                        "data": {
+                            "object": {"id": intent_id, "object": "payment_intent"}
+                        },
+                    }
+                )
+            )
+        repeat = int(len(deliveries) * options["duplicates"])
+        return deliveries + deliveries[:repeat]
+
+    def run(self, deliveries, batch_size):
+        client = Client()
+        url = reverse("shop:stripe_webhook")
+        secret = settings.STRIPE_WEBHOOK_SECRET
+        before = StripeEvent.objects.count()
+
+        start = time.perf_counter()
+        for payload in deliveries:
+            response = client.post(
+                url,
+                payload,
+                content_type="application/json",
+                HTTP_STRIPE_SIGNATURE=sign(payload, secret, int(time.time())),
+            )
+            if response.status_code != 200:
+                raise CommandError(f"Webhook answered {response.status_code}")
+        ingest = time.perf_counter() - start
+        stored = StripeEvent.objects.count() - before
+
+        start = time.perf_counter()
+        processed = 0
+        while handled := process_pending_events(batch_size=batch_size):
+            processed += handled
+        work = time.perf_counter() - start
+
+        self.stdout.write(
+            f"ingest   {len(deliveries)} deliveries  {stored} stored  "
+            f"{len(deliveries) / ingest:8.1f} req/s  "
+            f"{ingest / len(deliveries) * 1000:6.2f} ms/req"
+        )
+        self.stdout.write(
+            f"worker   {processed} events  "
+            f"{processed / work if work else 0:8.1f} events/s"
+        )
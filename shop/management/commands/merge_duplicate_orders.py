@@ -0,0 +1,80 @@
+# shop/management/commands/merge_duplicate_orders.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from shop.models import Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Merges orders that share a payment_intent_id into the oldest one "
+        "(needed before migration shop.0006 can add its unique constraint)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be moved and deleted without changing anything",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING("Running in dry-run mode. No changes will be made.")
+            )
+
+        duplicated = list(
+            Order.objects.exclude(payment_intent_id="")
+            .values("payment_intent_id")
+            .annotate(orders=Count("id"))
+            .filter(orders__gt=1)
+            .values_list("payment_intent_id", flat=True)
+        )
+        self.stdout.write(f"Found {len(duplicated)} payment intents with duplicates")
+
+        deleted_orders = 0
+        for payment_intent_id in duplicated:
+            with transaction.atomic():
+                deleted_orders += self.merge(payment_intent_id, dry_run)
+
+        verb = "Would delete" if dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted_orders} orders"))
+
+    def merge(self, payment_intent_id, dry_run):
+        keeper, *others = Order.objects.select_for_update().filter(
+            payment_intent_id=payment_intent_id
+        ).order_by("pk")
+        other_ids = [order.pk for order in others]
+
+        # Items for products the kept order already has are the same sale
+        # recorded twice and go with their order; anything else moves over
+        items = OrderItem.objects.filter(order_id__in=other_ids)
+        kept_products = OrderItem.objects.filter(order=keeper).values("product_id")
+        moving = items.exclude(product_id__in=kept_products)
+        dropped = items.filter(product_id__in=kept_products)
+
+        self.stdout.write(f"{payment_intent_id}: keep {keeper.order_id}")
+        for order in others:
+            self.stdout.write(
+                f"  Delete {order.order_id} ({order.status}, "
+                f"paid={order.paid}, created {order.created:%Y-%m-%d %H:%M})"
+            )
+        for item in moving.select_related("product"):
+            self.stdout.write(f"  Move item {item.pk}: {item.product.title}")
+        for item in dropped.select_related("product"):
+            self.stdout.write(f"  Drop duplicate item {item.pk}: {item.product.title}")
+
+        if dry_run:
+            return len(others)
+
+        moving.update(order=keeper)
+        keeper.paid = keeper.paid or any(order.paid for order in others)
+        if any(order.status == "completed" for order in others):
+            keeper.status = "completed"
+        keeper.save(update_fields=["paid", "status", "updated"])
+        Order.objects.filter(pk__in=other_ids).delete()
+        return len(others)
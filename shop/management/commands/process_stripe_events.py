@@ -0,0 +1,50 @@
+# shop/management/commands/process_stripe_events.py
+import time
+
+from django.core.management.base import BaseCommand
+from shop.webhooks import MAX_ATTEMPTS, process_pending_events
+
+
+class Command(BaseCommand):
+    help = "Processes stored Stripe webhook events (run as a long-lived worker)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Events claimed per transaction (default 50)",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=MAX_ATTEMPTS,
+            help=f"Skip events that failed this many times (default {MAX_ATTEMPTS})",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=2.0,
+            help="Seconds to sleep when the queue is empty (default 2)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the queue once and exit instead of polling",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            handled = process_pending_events(
+                batch_size=options["batch_size"],
+                max_attempts=options["max_attempts"],
+            )
+            total += handled
+            if handled:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} Stripe events"))
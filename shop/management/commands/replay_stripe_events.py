@@ -0,0 +1,44 @@
+# shop/management/commands/replay_stripe_events.py
+from django.core.management.base import BaseCommand, CommandError
+from shop.models import StripeEvent
+from shop.webhooks import process_pending_events
+
+
+class Command(BaseCommand):
+    help = "Queues stored Stripe events for processing again"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "event_ids", nargs="*", help="Stripe event ids (evt_...) to replay"
+        )
+        parser.add_argument(
+            "--failed",
+            action="store_true",
+            help="Replay every event that is in the failed state",
+        )
+        parser.add_argument(
+            "--process",
+            action="store_true",
+            help="Process the replayed events now instead of leaving them to the worker",
+        )
+
+    def handle(self, *args, **options):
+        if options["event_ids"]:
+            events = StripeEvent.objects.filter(event_id__in=options["event_ids"])
+        elif options["failed"]:
+            events = StripeEvent.objects.filter(status="failed")
+        else:
+            raise CommandError("Give event ids or --failed")
+
+        queued = events.update(
+            status="pending", attempts=0, last_error="", next_attempt_at=None
+        )
+        self.stdout.write(f"Queued {queued} events")
+
+        if options["process"]:
+            processed = 0
+            while handled := process_pending_events():
+                processed += handled
+            self.stdout.write(f"Processed {processed} events")
+
+        self.stdout.write(self.style.SUCCESS("Replay complete"))
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.core.management.base import CommandError
+from django.db import migrations, models
+
+
+class AddIndexConcurrentlyOnPostgres(AddIndexConcurrently):
+    """CREATE INDEX CONCURRENTLY on PostgreSQL, a plain CREATE INDEX elsewhere"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        return migrations.AddIndex.database_forwards(
+            self, app_label, schema_editor, from_state, to_state
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        return migrations.AddIndex.database_backwards(
+            self, app_label, schema_editor, from_state, to_state
+        )
+
+
+def check_duplicate_orders(apps, schema_editor):
+    """
+    The unique constraint below can't be added while one payment_intent_id
+    has several orders (the old check-then-create success page could record
+    a payment twice). Merging them deletes orders, so that is left to a
+    command whose report can be reviewed first.
+    """
+    Order = apps.get_model("shop", "Order")
+    duplicated = (
+        Order.objects.exclude(payment_intent_id="")
+        .values("payment_intent_id")
+        .annotate(orders=models.Count("id"))
+        .filter(orders__gt=1)
+    )
+    if duplicated.exists():
+        raise CommandError(
+            "Some payment intents have more than one order. Review the report "
+            "from `manage.py merge_duplicate_orders --dry-run`, run it without "
+            "--dry-run, then migrate again."
+        )
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("shop", "0005_stripeevent"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_orders, migrations.RunPython.noop),
+        AddIndexConcurrentlyOnPostgres(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "-created"], name="shop_order_user_created_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="order",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("payment_intent_id", ""), _negated=True),
+                fields=("payment_intent_id",),
+                name="shop_order_unique_payment_intent",
+            ),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name="orderitem",
+            index=models.Index(
+                fields=["product", "order"], name="shop_item_product_order_idx"
+            ),
+        ),
+    ]
@@ -1,11 +1,21 @@
 # zestizm / shop / models.py
 from django.db import models
+from django.db.models import Avg, Count, F, Prefetch, Q, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.urls import reverse
 from django.conf import settings
 import uuid
+from functools import cached_property
 from decimal import Decimal
 from zestizm.storage import secure_storage, public_storage
-from zestizm.utils import custom_slugify
+from zestizm.utils import (
+    EXCERPT_LENGTH,
+    custom_slugify,
+    summarise_html,
+    unique_slugify,
+)
 from tinymce.models import HTMLField
 
 
@@ -34,6 +44,14 @@ class Category(models.Model):
         return reverse("shop:category", kwargs={"slug": self.slug})
 
 
+class ProductQuerySet(models.QuerySet):
+    def with_review_stats(self):
+        """Rating average and count in the same query, for product grids"""
+        return self.annotate(
+            review_avg=Avg("reviews__rating"), review_count=Count("reviews")
+        )
+
+
 class Product(models.Model):
     STATUS_CHOICES = [
         ("publish", "Published"),
@@ -51,6 +69,9 @@ class Product(models.Model):
     description = HTMLField()
     section_description = models.TextField(blank=True, null=True)
     long_description = HTMLField(blank=True, null=True)
+    # Plain-text summary of the descriptions, maintained by save()
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
     product_type = models.CharField(
         max_length=20, choices=PRODUCT_TYPES, default="download"
     )
@@ -117,6 +138,8 @@ class Product(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ["order", "-created"]
 
@@ -124,15 +147,31 @@ class Product(models.Model):
         return self.title
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-
+        # Fill generated fields first so every save is a single write
         if not self.slug:
-            self.slug = custom_slugify(self.title)
+            self.slug = unique_slugify(self, self.title)
         if not self.public_id:
             self.public_id = generate_public_id(self)
-
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"description", "long_description"} & set(
+            update_fields
+        ):
+            self.update_summary()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "excerpt", "word_count"}
         super().save(*args, **kwargs)
 
+    def update_summary(self):
+        self.excerpt, self.word_count = summarise_html(
+            self.description, self.long_description
+        )
+
+    def increment_purchase_count(self, quantity=1):
+        """Bump the counter in SQL, without rewriting the rest of the row"""
+        Product.objects.filter(pk=self.pk).update(
+            purchase_count=F("purchase_count") + quantity
+        )
+
     def get_absolute_url(self):
         return reverse("shop:product_detail", kwargs={"slug": self.slug})
 
@@ -198,16 +237,21 @@ class Product(models.Model):
     def is_fully_booked(self):
         return self.status == "full"
 
+    @cached_property
+    def review_stats(self):
+        """(average, count); annotated by with_review_stats() or one query"""
+        if hasattr(self, "review_count"):
+            return self.review_avg or 0, self.review_count
+        stats = self.reviews.aggregate(avg=Avg("rating"), count=Count("id"))
+        return stats["avg"] or 0, stats["count"]
+
     @property
     def average_rating(self):
-        reviews = self.reviews.all()
-        if reviews.exists():
-            return sum(review.rating for review in reviews) / reviews.count()
-        return 0
+        return self.review_stats[0]
 
     @property
     def total_reviews(self):
-        return self.reviews.count()
+        return self.review_stats[1]
 
     def can_review(self, user):
         # Superusers can always review
@@ -215,11 +259,9 @@ class Product(models.Model):
             return True
 
         # For regular users, check purchase and review status
-        has_purchased = OrderItem.objects.filter(
-            order__user=user, product=self, order__status="completed"
-        ).exists()
-        has_reviewed = self.reviews.filter(user=user).exists()
-        return has_purchased and not has_reviewed
+        if self.pk not in owned_product_ids(user):
+            return False
+        return not self.reviews.filter(user=user).exists()
 
 
 class ProductImage(models.Model):
@@ -235,6 +277,32 @@ class ProductImage(models.Model):
         ordering = ["order"]
 
 
+class OrderQuerySet(models.QuerySet):
+    def for_user(self, user):
+        return self.filter(user=user)
+
+    def with_items(self):
+        """Prefetch items and their products in one extra query"""
+        return self.prefetch_related(
+            Prefetch(
+                "items",
+                queryset=OrderItem.objects.select_related("product").order_by("id"),
+            )
+        )
+
+    def with_totals(self):
+        """Annotate total_pence, computed in SQL"""
+        return self.annotate(
+            total_pence=Coalesce(
+                Sum(F("items__price_paid_pence") * F("items__quantity")), 0
+            )
+        )
+
+    def purchase_history(self, user):
+        """A user's orders ready for the purchases/order history pages"""
+        return self.for_user(user).with_totals().with_items()
+
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ("pending", "Pending"),
@@ -254,8 +322,24 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
     payment_intent_id = models.CharField(max_length=250, blank=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            # Purchase history: filter(user=...).order_by("-created")
+            models.Index(
+                fields=["user", "-created"], name="shop_order_user_created_idx"
+            ),
+        ]
+        constraints = [
+            # Webhook and success-page lookups; blank for unpaid manual orders
+            models.UniqueConstraint(
+                fields=["payment_intent_id"],
+                condition=~Q(payment_intent_id=""),
+                name="shop_order_unique_payment_intent",
+            ),
+        ]
 
     def __str__(self):
         return f"Order {self.order_id}"
@@ -267,7 +351,16 @@ class Order(models.Model):
 
     def get_total_cost(self):
         """Return total cost in pounds"""
-        return sum(item.get_cost() for item in self.items.all())
+        # Annotated by OrderQuerySet.with_totals()
+        if hasattr(self, "total_pence"):
+            return self.total_pence / 100
+        # Items already prefetched: no extra query
+        if "items" in getattr(self, "_prefetched_objects_cache", {}):
+            return sum(item.get_cost() for item in self.items.all())
+        total = self.items.aggregate(
+            total=Coalesce(Sum(F("price_paid_pence") * F("quantity")), 0)
+        )["total"]
+        return total / 100
 
     @property
     def total_price(self):
@@ -284,6 +377,14 @@ class OrderItem(models.Model):
     downloads_remaining = models.PositiveIntegerField(default=5)
     download_count = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # Ownership and download lookups by (product, order__user)
+            models.Index(
+                fields=["product", "order"], name="shop_item_product_order_idx"
+            ),
+        ]
+
     def __str__(self):
         return str(self.id)
 
@@ -334,12 +435,21 @@ class ProductReview(models.Model):
 
     @property
     def is_verified_purchase(self):
-        return OrderItem.objects.filter(
-            order__user=self.user, product=self.product, order__status="completed"
+        if ProductReview.user.is_cached(self):
+            return self.product_id in owned_product_ids(self.user)
+        return Purchase.objects.filter(
+            user_id=self.user_id, product_id=self.product_id
         ).exists()
 
 
 class Purchase(models.Model):
+    """
+    Ownership index: one row per (user, product) from completed orders.
+    Written during fulfilment and backfilled by `manage.py backfill_purchases`;
+    rows lose their backing when an order is cancelled or deleted, see
+    forget_unowned().
+    """
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     product = models.ForeignKey("Product", on_delete=models.CASCADE)
     purchased_at = models.DateTimeField(auto_now_add=True)
@@ -349,3 +459,118 @@ class Purchase(models.Model):
 
     def __str__(self):
         return f"{self.user.username} bought {self.product.title}"
+
+    @classmethod
+    def record_order(cls, order):
+        """Index the products of a completed order; safe to call repeatedly"""
+        if not order.user_id or order.status != "completed":
+            return
+        product_ids = set(order.items.values_list("product_id", flat=True))
+        cls.objects.bulk_create(
+            [cls(user_id=order.user_id, product_id=pid) for pid in product_ids],
+            ignore_conflicts=True,
+        )
+        if Order.user.is_cached(order) and order.user is not None:
+            order.user.__dict__.pop(OWNED_PRODUCTS_ATTR, None)
+
+    @classmethod
+    def forget_unowned(cls, user_id, product_ids=None):
+        """
+        Delete the user's rows (optionally only for `product_ids`) that no
+        completed order backs any more, in one DELETE.
+        """
+        if not user_id:
+            return
+        rows = cls.objects.filter(user_id=user_id)
+        if product_ids is not None:
+            rows = rows.filter(product_id__in=product_ids)
+        still_owned = OrderItem.objects.filter(
+            order__user_id=user_id, order__status="completed"
+        ).values("product_id")
+        rows.exclude(product_id__in=still_owned).delete()
+
+
+class StripeEvent(models.Model):
+    """
+    Raw webhook events, stored once per Stripe event id.
+
+    The webhook view only verifies and inserts; `manage.py process_stripe_events`
+    does the work, so Stripe retries of an event already stored are no-ops.
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processed", "Processed"),
+        ("failed", "Failed"),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Failed events wait until then before the next attempt
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["received_at"]
+        indexes = [models.Index(fields=["status", "received_at"])]
+
+    def __str__(self):
+        return f"{self.event_type} ({self.event_id})"
+
+    @property
+    def data_object(self):
+        return self.payload.get("data", {}).get("object", {})
+
+
+OWNED_PRODUCTS_ATTR = "_owned_product_ids"
+
+
+def owned_product_ids(user):
+    """
+    Ids of the products `user` owns. Memoised on the user object, so with
+    request.user every ownership check in a request shares one query.
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    owned = user.__dict__.get(OWNED_PRODUCTS_ATTR)
+    if owned is None:
+        owned = frozenset(
+            Purchase.objects.filter(user=user).values_list("product_id", flat=True)
+        )
+        user.__dict__[OWNED_PRODUCTS_ATTR] = owned
+    return owned
+
+
+@receiver(post_save, sender=Order)
+def index_completed_order(sender, instance, created, **kwargs):
+    # Covers webhook fulfilment and manual status changes in the admin
+    if instance.status == "completed":
+        Purchase.record_order(instance)
+    elif not created:
+        # Possibly moved away from completed (cancelled/failed in the admin)
+        Purchase.forget_unowned(
+            instance.user_id, instance.items.values("product_id")
+        )
+        if Order.user.is_cached(instance) and instance.user is not None:
+            instance.user.__dict__.pop(OWNED_PRODUCTS_ATTR, None)
+
+
+@receiver(post_delete, sender=Order)
+def unindex_deleted_order(sender, instance, **kwargs):
+    # Its items are already gone, so recheck everything the user owns
+    Purchase.forget_unowned(instance.user_id)
+
+
+@receiver(post_delete, sender=OrderItem)
+def unindex_deleted_item(sender, instance, **kwargs):
+    user_id = (
+        Order.objects.filter(pk=instance.order_id)
+        .values_list("user_id", flat=True)
+        .first()
+    )
+    Purchase.forget_unowned(user_id, [instance.product_id])
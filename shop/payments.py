@@ -0,0 +1,269 @@
+import hashlib
+import itertools
+import json
+import secrets
+import threading
+from functools import lru_cache
+
+import stripe
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import Order
+
+# Session key holding a random value mixed into idempotency keys, so the
+# same cart bought again after a completed checkout gets fresh keys
+CHECKOUT_NONCE_KEY = "checkout_nonce"
+# Session key holding the open PaymentIntent and the cart it was priced for
+CHECKOUT_INTENT_KEY = "checkout_intent"
+
+
+# -------------------------------
+# Idempotency keys
+# -------------------------------
+def get_checkout_nonce(session):
+    nonce = session.get(CHECKOUT_NONCE_KEY)
+    if not nonce:
+        nonce = session[CHECKOUT_NONCE_KEY] = secrets.token_hex(8)
+    return nonce
+
+
+def rotate_checkout_nonce(session):
+    session[CHECKOUT_NONCE_KEY] = secrets.token_hex(8)
+
+
+def checkout_idempotency_key(request, cart, action, *parts):
+    """
+    Stable key for one Stripe call: same action, user, checkout session and
+    cart contents give the same key, so a retried request cannot create a
+    second object on Stripe's side.
+    """
+    raw = ":".join(
+        [
+            action,
+            str(request.user.pk),
+            get_checkout_nonce(request.session),
+            cart.fingerprint(),
+            *map(str, parts),
+        ]
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# -------------------------------
+# Checkout intents
+# -------------------------------
+def get_checkout_intent(request, cart, amount, currency, **create_kwargs):
+    """
+    Return (intent_id, client_secret) for the current cart.
+
+    The open intent is remembered in the session with the cart fingerprint it
+    was priced for. Reloading checkout with the same cart costs no Stripe call,
+    a changed cart updates the amount in place, and only a new checkout (or an
+    intent Stripe no longer accepts changes to) creates a fresh intent. An
+    intent that already has an order was paid and is never handed back.
+    """
+    gateway = get_gateway()
+    fingerprint = cart.fingerprint()
+    stored = request.session.get(CHECKOUT_INTENT_KEY)
+
+    if stored and Order.objects.filter(payment_intent_id=stored["id"]).exists():
+        # Also rotates the nonce, so the create below can't replay the old one
+        forget_checkout_intent(request.session)
+        stored = None
+
+    if stored and stored["fingerprint"] == fingerprint:
+        return stored["id"], stored["client_secret"]
+
+    intent = None
+    if stored:
+        try:
+            intent = gateway.update_payment_intent(
+                stored["id"],
+                amount=amount,
+                idempotency_key=checkout_idempotency_key(
+                    request, cart, "update", stored["id"]
+                ),
+            )
+        except stripe.InvalidRequestError:
+            # Already paid or cancelled: fall through to a new intent
+            intent = None
+
+    if intent is None:
+        intent = gateway.create_payment_intent(
+            amount=amount,
+            currency=currency,
+            idempotency_key=checkout_idempotency_key(request, cart, "create"),
+            **create_kwargs,
+        )
+
+    request.session[CHECKOUT_INTENT_KEY] = {
+        "id": intent.id,
+        "client_secret": intent.client_secret,
+        "fingerprint": fingerprint,
+    }
+    return intent.id, intent.client_secret
+
+
+def forget_checkout_intent(session):
+    """Drop the open intent and start a new idempotency scope"""
+    session.pop(CHECKOUT_INTENT_KEY, None)
+    rotate_checkout_nonce(session)
+
+
+def is_checkout_intent(session, intent_id):
+    """Whether intent_id is the open intent of this session's checkout"""
+    stored = session.get(CHECKOUT_INTENT_KEY)
+    return bool(stored) and stored["id"] == intent_id
+
+
+# -------------------------------
+# Gateways
+# -------------------------------
+class StripeGateway:
+    """
+    Thin wrapper around a configured StripeClient.
+
+    The client is built once per process (see get_gateway) and its
+    RequestsClient keeps a requests session per thread, so TLS connections to
+    api.stripe.com are reused between checkouts. Every call gets the
+    STRIPE_TIMEOUT (connect, read) budget and at most
+    STRIPE_MAX_NETWORK_RETRIES retries on network errors.
+    """
+
+    def __init__(self, api_key=None, timeout=None, max_network_retries=None):
+        if timeout is None:
+            timeout = settings.STRIPE_TIMEOUT
+        if max_network_retries is None:
+            max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
+        self.client = stripe.StripeClient(
+            api_key or settings.STRIPE_SECRET_KEY,
+            max_network_retries=max_network_retries,
+            http_client=stripe.RequestsClient(timeout=tuple(timeout)),
+        )
+
+    @staticmethod
+    def _options(idempotency_key):
+        return {"idempotency_key": idempotency_key} if idempotency_key else None
+
+    def create_payment_intent(
+        self, amount, currency, metadata=None, receipt_email=None, idempotency_key=None
+    ):
+        params = {
+            "amount": amount,
+            "currency": currency,
+            "payment_method_types": ["card"],
+            "metadata": metadata or {},
+        }
+        if receipt_email:
+            params["receipt_email"] = receipt_email
+        return self.client.v1.payment_intents.create(
+            params=params, options=self._options(idempotency_key)
+        )
+
+    def retrieve_payment_intent(self, intent_id):
+        return self.client.v1.payment_intents.retrieve(intent_id)
+
+    def update_payment_intent(self, intent_id, amount, idempotency_key=None):
+        return self.client.v1.payment_intents.update(
+            intent_id,
+            params={"amount": amount},
+            options=self._options(idempotency_key),
+        )
+
+    def construct_event(self, payload, sig_header):
+        """Verify a webhook signature; raises SignatureVerificationError"""
+        return self.client.construct_event(
+            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
+        )
+
+
+class FakeGateway:
+    """
+    In-memory gateway for tests and offline development.
+
+    Returns real stripe.PaymentIntent objects without any network access and
+    honours idempotency keys. Use `succeed()` to mark an intent as paid.
+    Webhook payloads are trusted as-is.
+    """
+
+    def __init__(self, **kwargs):
+        self.intents = {}
+        self.calls = []
+        self._by_key = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create_payment_intent(
+        self, amount, currency, metadata=None, receipt_email=None, idempotency_key=None
+    ):
+        with self._lock:
+            self.calls.append("create")
+            if idempotency_key in self._by_key:
+                return self._by_key[idempotency_key]
+            intent_id = f"pi_fake_{next(self._ids)}"
+            intent = stripe.PaymentIntent.construct_from(
+                {
+                    "id": intent_id,
+                    "object": "payment_intent",
+                    "client_secret": f"{intent_id}_secret_fake",
+                    "amount": amount,
+                    "currency": currency,
+                    "status": "requires_payment_method",
+                    "metadata": metadata or {},
+                    "receipt_email": receipt_email,
+                },
+                "sk_test_fake",
+            )
+            self.intents[intent_id] = intent
+            if idempotency_key:
+                self._by_key[idempotency_key] = intent
+            return intent
+
+    def retrieve_payment_intent(self, intent_id):
+        with self._lock:
+            self.calls.append("retrieve")
+            try:
+                return self.intents[intent_id]
+            except KeyError:
+                raise stripe.InvalidRequestError(
+                    f"No such payment_intent: '{intent_id}'", "intent"
+                )
+
+    def update_payment_intent(self, intent_id, amount, idempotency_key=None):
+        with self._lock:
+            self.calls.append("update")
+            intent = self.intents.get(intent_id)
+            if intent is None:
+                raise stripe.InvalidRequestError(
+                    f"No such payment_intent: '{intent_id}'", "intent"
+                )
+            if intent.status in ("succeeded", "canceled"):
+                raise stripe.InvalidRequestError(
+                    f"This PaymentIntent's amount could not be updated because "
+                    f"it has a status of {intent.status}.",
+                    "amount",
+                )
+            intent.amount = amount
+            return intent
+
+    def construct_event(self, payload, sig_header):
+        return stripe.Event.construct_from(json.loads(payload), "sk_test_fake")
+
+    def succeed(self, intent_id):
+        self.intents[intent_id].status = "succeeded"
+        return self.intents[intent_id]
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    """The process-wide gateway named by settings.STRIPE_GATEWAY"""
+    return import_string(settings.STRIPE_GATEWAY)()
+
+
+@receiver(setting_changed)
+def reset_gateway(setting, **kwargs):
+    if setting.startswith("STRIPE_"):
+        get_gateway.cache_clear()
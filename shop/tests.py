@@ -1,3 +1,705 @@
-from django.test import TestCase
+import base64
+import json
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from zestizm.nplusone import NPlusOneError, NPlusOneTestMixin
+from zestizm.pagination import KeysetPaginator
+from zestizm.registry import ModelRegistry
+
+from .categories import category_registry
+from .models import (
+    Category,
+    Order,
+    OrderItem,
+    Product,
+    Purchase,
+    StripeEvent,
+    owned_product_ids,
+)
+from .payments import get_gateway
+from .webhooks import process_pending_events, retry_delay
+
+
+def make_product(category, title, price_pence=500):
+    product = Product(
+        title=title,
+        category=category,
+        description="<p>Test product</p>",
+        price_pence=price_pence,
+        status="publish",
+    )
+    product.save()
+    return product
+
+
+class PurchaseHistoryQueryTests(TestCase):
+    """The purchase pages must not issue queries per order or per item."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("buyer", "buyer@example.com", "pw")
+        category = Category.objects.create(name="Guides", slug="guides")
+        cls.products = [
+            make_product(category, f"Guide {i}", price_pence=100 * (i + 1))
+            for i in range(3)
+        ]
+
+    def add_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(
+                user=self.user, email=self.user.email, paid=True, status="completed"
+            )
+            for product in self.products:
+                OrderItem.objects.create(
+                    order=order,
+                    product=product,
+                    price_paid_pence=product.price_pence,
+                    quantity=2,
+                )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def test_query_count_does_not_grow_with_orders(self):
+        self.client.force_login(self.user)
+        for name in ("shop:purchases", "shop:order_history"):
+            with self.subTest(page=name):
+                url = reverse(name)
+                Order.objects.all().delete()
+                self.add_orders(2)
+                few = self.count_queries(url)
+                self.add_orders(15)
+                many = self.count_queries(url)
+                self.assertEqual(few, many)
+
+    def test_totals_are_annotated_in_sql(self):
+        self.add_orders(1)
+        order = Order.objects.purchase_history(self.user).get()
+        with self.assertNumQueries(0):
+            # 2 x (1.00 + 2.00 + 3.00)
+            self.assertEqual(order.get_total_cost(), 12)
+            self.assertEqual(
+                [item.product.title for item in order.items.all()],
+                ["Guide 0", "Guide 1", "Guide 2"],
+            )
+
+    def test_history_is_paginated(self):
+        self.add_orders(25)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("shop:purchases"))
+        page = response.context["orders"]
+        self.assertEqual(len(page), 20)
+        self.assertTrue(page.has_next())
+
+        response = self.client.get(
+            reverse("shop:purchases"), {"cursor": page.next_cursor}
+        )
+        self.assertEqual(len(response.context["orders"]), 5)
+
+
+class OwnershipIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("owner", "owner@example.com", "pw")
+        category = Category.objects.create(name="Guides", slug="guides")
+        cls.owned = make_product(category, "Owned guide")
+        cls.other = make_product(category, "Other guide")
+
+    def complete_order(self, product):
+        order = Order.objects.create(user=self.user, email=self.user.email)
+        OrderItem.objects.create(
+            order=order, product=product, price_paid_pence=product.price_pence
+        )
+        order.status = "completed"
+        order.paid = True
+        order.save()
+        return order
+
+    def test_completed_order_is_indexed_once(self):
+        order = self.complete_order(self.owned)
+        order.save()
+        self.assertEqual(
+            list(Purchase.objects.values_list("user_id", "product_id")),
+            [(self.user.pk, self.owned.pk)],
+        )
+
+    def index_rows(self):
+        return set(Purchase.objects.values_list("user_id", "product_id"))
+
+    def test_cancelling_a_completed_order_removes_its_rows(self):
+        order = self.complete_order(self.owned)
+        order.status = "cancelled"
+        order.save()
+        self.assertEqual(self.index_rows(), set())
+
+    def test_rows_backed_by_another_completed_order_are_kept(self):
+        self.complete_order(self.owned)
+        second = self.complete_order(self.owned)
+        second.status = "cancelled"
+        second.save()
+        self.assertEqual(self.index_rows(), {(self.user.pk, self.owned.pk)})
+
+    def test_deleting_an_order_removes_its_rows(self):
+        order = self.complete_order(self.owned)
+        self.complete_order(self.other)
+        order.delete()
+        self.assertEqual(self.index_rows(), {(self.user.pk, self.other.pk)})
+
+    def test_deleting_an_item_removes_its_row(self):
+        order = self.complete_order(self.owned)
+        OrderItem.objects.create(order=order, product=self.other, price_paid_pence=500)
+        order.save()
+        order.items.get(product=self.owned).delete()
+        self.assertEqual(self.index_rows(), {(self.user.pk, self.other.pk)})
+
+    def test_owned_ids_are_memoised_on_the_user(self):
+        self.complete_order(self.owned)
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(owned_product_ids(user), {self.owned.pk})
+            self.assertNotIn(self.other.pk, owned_product_ids(user))
+        self.assertFalse(self.other.can_review(user))
+
+
+class ProductSaveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Guides", slug="guides")
+
+    def count_writes(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        return [
+            q["sql"]
+            for q in ctx.captured_queries
+            if q["sql"].startswith(("INSERT", "UPDATE"))
+        ]
+
+    def test_create_and_edit_write_once(self):
+        product = Product(
+            title="Meal planner",
+            category=self.category,
+            description="<p>x</p>",
+            price_pence=500,
+        )
+        self.assertEqual(len(self.count_writes(product.save)), 1)
+        self.assertEqual(product.slug, "meal-planner")
+        self.assertTrue(product.public_id.startswith("meal-planner-"))
+
+        product.title = "Weekly meal planner"
+        self.assertEqual(len(self.count_writes(product.save)), 1)
+        self.assertEqual(product.slug, "meal-planner")
+
+    def test_objects_create_works(self):
+        product = Product.objects.create(
+            title="Budget sheet",
+            category=self.category,
+            description="<p>x</p>",
+            price_pence=500,
+        )
+        self.assertEqual(product.slug, "budget-sheet")
+
+    def test_slug_collisions_get_a_suffix(self):
+        slugs = [
+            make_product(self.category, "Recipe cards").slug for _ in range(3)
+        ]
+        self.assertEqual(slugs, ["recipe-cards", "recipe-cards-2", "recipe-cards-3"])
+
+    def test_long_titles_are_trimmed_to_fit_the_suffix(self):
+        title = "The complete seasonal kitchen planner with weekly shopping lists"
+        with CaptureQueriesContext(connection) as ctx:
+            slugs = [make_product(self.category, title).slug for _ in range(3)]
+        self.assertEqual(len(set(slugs)), 3)
+        self.assertTrue(all(len(slug) <= 50 for slug in slugs))
+        self.assertTrue(slugs[1].endswith("-2") and slugs[2].endswith("-3"))
+        # One slug lookup per save, however many collide
+        lookups = [q for q in ctx.captured_queries if "LIKE" in q["sql"]]
+        self.assertEqual(len(lookups), 3)
+
+    def test_purchase_count_bump_touches_one_column(self):
+        product = make_product(self.category, "Planner")
+        writes = self.count_writes(lambda: product.increment_purchase_count(2))
+        self.assertEqual(len(writes), 1)
+        self.assertNotIn("title", writes[0])
+        product.refresh_from_db()
+        self.assertEqual(product.purchase_count, 2)
+
+    def test_excerpt_follows_descriptions(self):
+        product = make_product(self.category, "Planner")
+        product.description = (
+            "<p>Plan &amp; cook <b>every</b> week</p><script>track()</script>"
+        )
+        product.long_description = "<p>Two more</p>"
+        product.save(update_fields=["description", "long_description"])
+        product.refresh_from_db()
+        self.assertEqual(product.excerpt, "Plan & cook every week Two more")
+        self.assertEqual(product.word_count, 7)
+
+        product.title = "Planner v2"
+        writes = self.count_writes(lambda: product.save(update_fields=["title"]))
+        self.assertNotIn("excerpt", writes[0])
+
+
+class CategoryRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        category_registry._version = None
+
+    def test_invalidated_once_the_save_commits(self):
+        self.assertEqual(category_registry.all(), [])
+        with self.captureOnCommitCallbacks() as callbacks:
+            Category.objects.create(name="Guides", slug="guides")
+            self.assertIsNone(category_registry.get("guides"))
+        self.assertIsNone(category_registry.get("guides"))
+
+        for callback in callbacks:
+            callback()
+        self.assertIsNotNone(category_registry.get("guides"))
+
+    def test_local_copy_expires_without_an_invalidation(self):
+        registry = ModelRegistry(Category, "tests.category", max_age=60)
+        self.assertEqual(registry.all(), [])
+        Category.objects.bulk_create([Category(name="Guides", slug="guides")])
+        self.assertEqual(registry.all(), [])
+
+        later = time.monotonic() + 61
+        with mock.patch("zestizm.registry.time.monotonic", return_value=later):
+            self.assertEqual([c.slug for c in registry.all()], ["guides"])
+
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Guides", slug="guides")
+        for index in range(7):
+            make_product(cls.category, f"Guide {index}")
+        # Ties on the first two ordering keys, so only "-id" separates rows
+        Product.objects.update(order=0, created=timezone.now())
+        Product.objects.filter(title="Guide 6").update(order=1)
+        cls.expected = list(
+            Product.objects.order_by("order", "-created", "-id").values_list(
+                "pk", flat=True
+            )
+        )
+
+    def paginator(self):
+        return KeysetPaginator(Product.objects.all(), 3, ("order", "-created", "-id"))
+
+    def ids(self, page):
+        return [product.pk for product in page]
+
+    def encode(self, data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+    def test_next_cursors_walk_every_row_once(self):
+        paginator = self.paginator()
+        page = paginator.get_page()
+        seen = self.ids(page)
+        while page.has_next():
+            page = paginator.get_page(page.next_cursor)
+            seen += self.ids(page)
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(page.number, 3)
+        self.assertFalse(page.has_next())
+
+    def test_previous_cursor_returns_the_earlier_page(self):
+        paginator = self.paginator()
+        second = paginator.get_page(paginator.get_page().next_cursor)
+        third = paginator.get_page(second.next_cursor)
+        back = paginator.get_page(third.previous_cursor)
+        self.assertEqual(self.ids(back), self.expected[3:6])
+        self.assertEqual(back.number, 2)
+        first = paginator.get_page(back.previous_cursor)
+        self.assertEqual(self.ids(first), self.expected[:3])
+        self.assertEqual(first.number, 1)
+        self.assertFalse(first.has_previous())
+
+    def test_invalid_cursors_fall_back_to_the_first_page(self):
+        paginator = self.paginator()
+        cursor = paginator.get_page().next_cursor
+        tampered = [
+            "not base64!",
+            cursor[:-4],
+            self.encode({"v": [0], "d": "next", "n": 2}),
+            self.encode({"v": [0, "2020-01-01T00:00:00", 1], "d": "up", "n": 2}),
+            self.encode({"v": ["zero", "2020-01-01T00:00:00", 1], "d": "next"}),
+            self.encode({"v": [0, "yesterday", 1], "d": "next"}),
+            self.encode([0]),
+        ]
+        for value in tampered:
+            with self.subTest(cursor=value):
+                page = paginator.get_page(value)
+                self.assertEqual(self.ids(page), self.expected[:3])
+                self.assertEqual(page.number, 1)
+
+    def test_category_page_uses_the_cursor(self):
+        url = reverse("shop:category", args=[self.category.slug])
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, "shop/category.html")
+        page = response.context["products"]
+        self.assertEqual(len(page), 7)
+        self.assertFalse(page.has_next())
+
+@override_settings(STRIPE_GATEWAY="shop.payments.FakeGateway")
+class CheckoutGatewayTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("shopper", "shopper@example.com", "pw")
+        category = Category.objects.create(name="Guides", slug="guides")
+        cls.product = make_product(category, "Planner", price_pence=750)
+
+    def setUp(self):
+        get_gateway.cache_clear()
+        self.client.force_login(self.user)
+        self.client.post(reverse("shop:cart_add", args=[self.product.pk]))
+
+    def test_checkout_runs_offline(self):
+        response = self.client.get(reverse("shop:checkout"))
+        self.assertEqual(response.status_code, 200)
+        intent = get_gateway().intents[response.context["payment_intent_id"]]
+        self.assertEqual(intent.amount, 750)
+        self.assertEqual(response.context["client_secret"], intent.client_secret)
+
+    def test_payment_success_creates_the_order(self):
+        response = self.client.get(reverse("shop:checkout"))
+        intent_id = response.context["payment_intent_id"]
+        get_gateway().succeed(intent_id)
+
+        response = self.client.get(
+            reverse("shop:payment_success"), {"payment_intent": intent_id}
+        )
+        self.assertEqual(response.status_code, 200)
+        order = Order.objects.get(payment_intent_id=intent_id)
+        self.assertEqual(order.get_total_cost(), 7.5)
+        self.assertTrue(Purchase.objects.filter(user=self.user).exists())
+
+    def test_reloads_reuse_the_intent(self):
+        first = self.client.get(reverse("shop:checkout"))
+        second = self.client.get(reverse("shop:checkout"))
+        self.assertEqual(
+            first.context["payment_intent_id"], second.context["payment_intent_id"]
+        )
+        self.assertEqual(get_gateway().calls, ["create"])
+
+    def test_cart_change_updates_the_amount(self):
+        first = self.client.get(reverse("shop:checkout"))
+        self.client.post(
+            reverse("shop:cart_update", args=[self.product.pk]), {"quantity": 2}
+        )
+        second = self.client.get(reverse("shop:checkout"))
+        intent_id = second.context["payment_intent_id"]
+        self.assertEqual(first.context["payment_intent_id"], intent_id)
+        self.assertEqual(get_gateway().intents[intent_id].amount, 1500)
+        self.assertEqual(get_gateway().calls, ["create", "update"])
+
+    def test_paid_intent_is_not_reused(self):
+        first = self.client.get(reverse("shop:checkout"))
+        get_gateway().succeed(first.context["payment_intent_id"])
+        self.client.post(
+            reverse("shop:cart_update", args=[self.product.pk]), {"quantity": 2}
+        )
+        second = self.client.get(reverse("shop:checkout"))
+        self.assertNotEqual(
+            first.context["payment_intent_id"], second.context["payment_intent_id"]
+        )
+
+    def record_order(self, intent_id):
+        # As if another tab or the webhook had recorded the payment first
+        return Order.objects.create(
+            user=self.user, email=self.user.email, payment_intent_id=intent_id
+        )
+
+    def test_reload_after_payment_gets_a_new_intent(self):
+        first = self.client.get(reverse("shop:checkout"))
+        intent_id = first.context["payment_intent_id"]
+        get_gateway().succeed(intent_id)
+        self.record_order(intent_id)
+
+        second = self.client.get(reverse("shop:checkout"))
+        self.assertNotEqual(second.context["payment_intent_id"], intent_id)
+        intent = get_gateway().intents[second.context["payment_intent_id"]]
+        self.assertEqual(intent.status, "requires_payment_method")
+
+    def test_success_for_a_recorded_order_closes_the_checkout(self):
+        first = self.client.get(reverse("shop:checkout"))
+        intent_id = first.context["payment_intent_id"]
+        get_gateway().succeed(intent_id)
+        self.record_order(intent_id)
+
+        response = self.client.get(
+            reverse("shop:payment_success"), {"payment_intent": intent_id}
+        )
+        self.assertRedirects(response, reverse("shop:purchases"))
+        self.assertNotIn("checkout_intent", self.client.session)
+        self.assertEqual(self.client.get(reverse("shop:checkout")).status_code, 302)
+        # Whoever recorded the order sent its confirmation
+        self.assertEqual(mail.outbox, [])
+
+        # Same cart again: a fresh, unpaid intent
+        self.client.post(reverse("shop:cart_add", args=[self.product.pk]))
+        second = self.client.get(reverse("shop:checkout"))
+        self.assertNotEqual(second.context["payment_intent_id"], intent_id)
+
+    def test_success_racing_another_recording_keeps_one_order(self):
+        first = self.client.get(reverse("shop:checkout"))
+        intent_id = first.context["payment_intent_id"]
+        get_gateway().succeed(intent_id)
+        self.record_order(intent_id)
+
+        # The existence check misses the row a concurrent request just wrote
+        with mock.patch.object(Order.objects, "filter") as lookup:
+            lookup.return_value.first.return_value = None
+            response = self.client.get(
+                reverse("shop:payment_success"), {"payment_intent": intent_id}
+            )
+        self.assertRedirects(response, reverse("shop:purchases"))
+        self.assertEqual(Order.objects.filter(payment_intent_id=intent_id).count(), 1)
+        self.assertNotIn("checkout_intent", self.client.session)
+
+
+@override_settings(
+    STRIPE_GATEWAY="shop.payments.FakeGateway", SITE_URL="https://testserver"
+)
+class WebhookPipelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("payer", "payer@example.com", "pw")
+        category = Category.objects.create(name="Guides", slug="guides")
+        cls.products = [make_product(category, f"Guide {i}") for i in range(2)]
+
+    def setUp(self):
+        self.order = Order.objects.create(
+            user=self.user, email=self.user.email, payment_intent_id="pi_123"
+        )
+        for product in self.products:
+            OrderItem.objects.create(
+                order=self.order, product=product, price_paid_pence=500
+            )
+
+    def deliver(self, event_id="evt_1", event_type="payment_intent.succeeded"):
+        payload = {
+            "id": event_id,
+            "object": "event",
+            "type": event_type,
+            "data": {"object": {"id": "pi_123", "object": "payment_intent"}},
+        }
+        return self.client.post(
+            reverse("shop:stripe_webhook"),
+            json.dumps(payload),
+            content_type="application/json",
+        )
+
+    def test_ingest_only_stores_the_event(self):
+        self.assertEqual(self.deliver().status_code, 200)
+        self.assertEqual(self.deliver().status_code, 200)
+        event = StripeEvent.objects.get()
+        self.assertEqual(event.status, "pending")
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "pending")
+
+    def test_worker_fulfils_once(self):
+        self.deliver()
+        self.deliver("evt_2")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(process_pending_events(), 2)
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, "completed")
+        self.assertEqual(
+            set(StripeEvent.objects.values_list("status", flat=True)), {"processed"}
+        )
+        self.assertEqual(Purchase.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(
+            list(Product.objects.values_list("purchase_count", flat=True)), [1, 1]
+        )
+        admin_mails = [m for m in mail.outbox if m.subject.startswith("New Zestizm")]
+        self.assertEqual(len(admin_mails), 1)
+        self.assertEqual(len(self.confirmations()), 1)
+
+    def confirmations(self):
+        return [m for m in mail.outbox if m.subject.startswith("Order Confirmation")]
+
+    def test_no_second_confirmation_after_the_success_page(self):
+        # payment_success already recorded and confirmed the order
+        self.order.status = "completed"
+        self.order.paid = True
+        self.order.save()
+        self.deliver()
+        with self.captureOnCommitCallbacks(execute=True):
+            process_pending_events()
+        self.assertEqual(StripeEvent.objects.get().status, "processed")
+        self.assertEqual(self.confirmations(), [])
+
+    def test_failed_event_waits_for_its_backoff(self):
+        self.deliver()
+        with mock.patch.dict(
+            "shop.webhooks.HANDLERS",
+            {"payment_intent.succeeded": mock.Mock(side_effect=ValueError("down"))},
+        ), self.assertLogs("shop.webhooks", "ERROR"):
+            self.assertEqual(process_pending_events(), 1)
+            event = StripeEvent.objects.get()
+            self.assertEqual(event.status, "failed")
+            self.assertGreater(event.next_attempt_at, timezone.now())
+            self.assertEqual(process_pending_events(), 0)
+
+        later = timezone.now() + retry_delay(1) + timedelta(seconds=1)
+        with mock.patch("shop.webhooks.timezone.now", return_value=later):
+            self.assertEqual(process_pending_events(), 1)
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ("processed", 2))
+        self.assertIsNone(event.next_attempt_at)
+
+
+class MergeDuplicateOrdersTests(TransactionTestCase):
+    """Duplicates predate the unique constraint, so it is lifted per test."""
+
+    def setUp(self):
+        constraint = next(
+            c
+            for c in Order._meta.constraints
+            if c.name == "shop_order_unique_payment_intent"
+        )
+        with connection.schema_editor() as editor:
+            editor.remove_constraint(Order, constraint)
+        self.addCleanup(self.restore_constraint, constraint)
+
+        self.user = User.objects.create_user("payer", "payer@example.com", "pw")
+        category = Category.objects.create(name="Guides", slug="guides")
+        self.planner, self.journal = [
+            make_product(category, title) for title in ["Planner", "Journal"]
+        ]
+        self.keeper = self.record(self.planner, status="pending")
+        self.duplicate = self.record(self.planner, self.journal, status="completed")
+
+    def restore_constraint(self, constraint):
+        # Cleanups run before the flush, so clear out any duplicates first
+        Order.objects.all().delete()
+        with connection.schema_editor() as editor:
+            editor.add_constraint(Order, constraint)
+
+    def record(self, *products, status):
+        order = Order.objects.create(
+            user=self.user,
+            email=self.user.email,
+            payment_intent_id="pi_dup",
+            status=status,
+            paid=status == "completed",
+        )
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, price_paid_pence=500)
+        return order
+
+    def merge(self, *args):
+        out = StringIO()
+        call_command("merge_duplicate_orders", *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_reports_without_deleting(self):
+        output = self.merge("--dry-run")
+        self.assertIn(f"Delete {self.duplicate.order_id}", output)
+        self.assertIn("Move item", output)
+        self.assertIn("Drop duplicate item", output)
+        self.assertIn("Would delete 1 orders", output)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(OrderItem.objects.count(), 3)
+
+    def test_merges_into_the_oldest_order(self):
+        self.merge()
+        order = Order.objects.get()
+        self.assertEqual(order.pk, self.keeper.pk)
+        self.assertEqual((order.status, order.paid), ("completed", True))
+        self.assertEqual(
+            sorted(order.items.values_list("product__title", flat=True)),
+            ["Journal", "Planner"],
+        )
+        self.assertEqual(
+            set(Purchase.objects.values_list("product_id", flat=True)),
+            {self.planner.pk, self.journal.pk},
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN checks need PostgreSQL")
+class OrderIndexExplainTests(TestCase):
+    """The hot order lookups must be answerable from an index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("indexed", "indexed@example.com", "pw")
+        category = Category.objects.create(name="Guides", slug="guides")
+        cls.product = make_product(category, "Indexed guide")
+        order = Order.objects.create(
+            user=cls.user, email=cls.user.email, payment_intent_id="pi_indexed"
+        )
+        OrderItem.objects.create(order=order, product=cls.product, price_paid_pence=1)
+
+    def explain(self, queryset):
+        # Tiny test tables would always be scanned sequentially otherwise
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = self.explain(queryset)
+        self.assertIn(index_name, plan)
+        self.assertNotIn("Seq Scan", plan)
+
+    def test_payment_intent_lookup(self):
+        self.assertUsesIndex(
+            Order.objects.filter(payment_intent_id="pi_indexed"),
+            "shop_order_unique_payment_intent",
+        )
+
+    def test_purchase_history(self):
+        self.assertUsesIndex(
+            Order.objects.filter(user=self.user).order_by("-created"),
+            "shop_order_user_created_idx",
+        )
+
+    def test_order_item_ownership_lookup(self):
+        plan = self.explain(
+            OrderItem.objects.filter(order__user=self.user, product=self.product)
+        )
+        self.assertNotIn("Seq Scan", plan)
+
+
+class ProductPageNPlusOneTests(NPlusOneTestMixin, TestCase):
+    nplusone_fail = True
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Guides", slug="guides")
+        cls.products = [make_product(category, f"Guide {i}") for i in range(5)]
+        for i in range(4):
+            reviewer = User.objects.create_user(f"reviewer{i}", password="pw")
+            for product in cls.products:
+                product.reviews.create(user=reviewer, rating=4, comment="Useful")
+
+    def test_product_detail(self):
+        response = self.client.get(self.products[0].get_absolute_url())
+        self.assertContains(response, "reviewer3")
+
+    def test_category_grid(self):
+        response = self.client.get(reverse("shop:category", args=["guides"]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_detector_flags_lazy_relations(self):
+        with self.assertRaises(NPlusOneError):
+            with self.assertNoNPlusOne():
+                for review in self.products[0].reviews.all():
+                    review.user.username
@@ -1,25 +1,30 @@
 # shop/views.py
-from .models import Category, Product, Order, OrderItem
+from .models import Product, Order, OrderItem, Purchase, owned_product_ids
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.conf import settings
 from django.core.exceptions import PermissionDenied
-from django.http import HttpResponse, FileResponse, Http404
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, Http404
 from django.views.decorators.http import require_POST, require_http_methods
-from django.core.paginator import Paginator
-from django.views.decorators.csrf import csrf_exempt
 import stripe
 import os
 import logging
 import mimetypes
 from wsgiref.util import FileWrapper
 from shop.forms import ProductReviewForm
+from accounts.models import favourite_product_ids
+from zestizm.pagination import KeysetPaginator
 from .emails import send_order_confirmation_email, send_download_link_email
 from .cart import Cart
-
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
+from .payments import (
+    forget_checkout_intent,
+    get_checkout_intent,
+    get_gateway,
+    is_checkout_intent,
+)
+from .categories import category_registry
 
 # Set up logger
 logger = logging.getLogger("shop")
@@ -55,27 +60,42 @@ def product_detail(request, slug):
         Product, slug=slug, is_active=True, status__in=["publish", "soon", "full"]
     )
 
-    related_products = Product.objects.filter(
-        category=product.category,
-        status__in=["publish", "full"],
-        is_active=True,
-    ).exclude(id=product.id)[:3]
+    related_products = (
+        Product.objects.filter(
+            category=product.category,
+            status__in=["publish", "full"],
+            is_active=True,
+        )
+        .exclude(id=product.id)
+        .with_review_stats()[:3]
+    )
+    reviews = product.reviews.select_related("user")
 
-    has_purchased = False
+    owned_ids = owned_product_ids(request.user)
+    has_purchased = product.id in owned_ids
     order_item = None
     review_form = None
 
+    if has_purchased:
+        order_item = (
+            OrderItem.objects.filter(
+                order__user=request.user, order__status="completed", product=product
+            )
+            .select_related("order")
+            .first()
+        )
     if request.user.is_authenticated:
-        order_item = OrderItem.objects.filter(
-            order__user=request.user, order__paid=True, product=product
-        ).first()
-
-        has_purchased = bool(order_item)
         review_form = ProductReviewForm() if product.can_review(request.user) else None
 
     # fetch additional images
     images = product.images.all()
 
+    # Heart state for this product and the related cards, in one query
+    related_products = list(related_products)
+    favourite_ids = favourite_product_ids(
+        request.user, [product, *related_products]
+    )
+
     return render(
         request,
         "shop/detail.html",
@@ -87,6 +107,10 @@ def product_detail(request, slug):
             "stripe_publishable_key": settings.STRIPE_PUBLISHABLE_KEY,
             "form": review_form,
             "images": images,
+            "reviews": reviews,
+            "is_favourite": product.id in favourite_ids,
+            "favourite_ids": favourite_ids,
+            "owned_ids": owned_ids,
             "request": request,
         },
     )
@@ -107,7 +131,7 @@ def cart_add(request, product_id):
 
 
 def category_hub(request):
-    categories = Category.objects.all()
+    categories = category_registry.all()
     return render(request, "shop/category_hub.html", {"categories": categories})
 
 
@@ -151,19 +175,20 @@ def checkout(request):
         return redirect("shop:cart_detail")
 
     try:
-        intent = stripe.PaymentIntent.create(
+        intent_id, client_secret = get_checkout_intent(
+            request,
+            cart,
             amount=int(total_price * 100),
             currency=getattr(settings, "STRIPE_CURRENCY", "gbp"),
-            payment_method_types=["card"],
             metadata={"user_id": str(request.user.id)},
             receipt_email=request.user.email,
         )
 
         context = {
-            "client_secret": intent.client_secret,
+            "client_secret": client_secret,
             "stripe_publishable_key": settings.STRIPE_PUBLISHABLE_KEY,
             "cart": cart,
-            "payment_intent_id": intent.id,
+            "payment_intent_id": intent_id,
         }
         return render(request, "shop/checkout.html", context)
 
@@ -178,6 +203,15 @@ def checkout(request):
         return redirect("shop:cart_detail")
 
 
+def _already_recorded(request, payment_intent_id):
+    # Recorded already (a refresh, another tab or the webhook): still close
+    # this checkout so its paid intent is never offered again
+    if is_checkout_intent(request.session, payment_intent_id):
+        Cart(request).clear()
+        forget_checkout_intent(request.session)
+    return redirect("shop:purchases")
+
+
 def payment_success(request):
     payment_intent_id = request.GET.get("payment_intent")
     if not payment_intent_id:
@@ -186,7 +220,7 @@ def payment_success(request):
 
     try:
         # Verify payment with Stripe
-        payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+        payment_intent = get_gateway().retrieve_payment_intent(payment_intent_id)
         if payment_intent.status != "succeeded":
             logger.warning(f"Payment intent {payment_intent_id} not succeeded")
             messages.error(request, "Payment was not successful.")
@@ -203,18 +237,23 @@ def payment_success(request):
             payment_intent_id=payment_intent_id
         ).first()
         if existing_order:
-            return redirect("shop:purchases")
+            return _already_recorded(request, payment_intent_id)
 
         cart = Cart(request)
 
         # Create order
-        order = Order.objects.create(
-            user=request.user,
-            email=email,
-            payment_intent_id=payment_intent_id,
-            paid=True,
-            status="completed",
-        )
+        try:
+            with transaction.atomic():
+                order = Order.objects.create(
+                    user=request.user,
+                    email=email,
+                    payment_intent_id=payment_intent_id,
+                    paid=True,
+                    status="completed",
+                )
+        except IntegrityError:
+            # A concurrent request recorded it between the check and here
+            return _already_recorded(request, payment_intent_id)
 
         for item in cart:
             OrderItem.objects.create(
@@ -225,9 +264,9 @@ def payment_success(request):
                 downloads_remaining=item["product"].download_limit,
             )
 
-            product = item["product"]
-            product.purchase_count += item["quantity"]
-            product.save()
+            item["product"].increment_purchase_count(item["quantity"])
+
+        Purchase.record_order(order)
 
         try:
             send_order_confirmation_email(order)
@@ -239,6 +278,7 @@ def payment_success(request):
             logger.error(f"Failed to send order confirmation email: {str(e)}")
 
         cart.clear()
+        forget_checkout_intent(request.session)
 
         return render(request, "shop/success.html", {"order": order})
 
@@ -261,10 +301,17 @@ def payment_cancel(request):
 @login_required
 def download_product(request, product_id):
     product = get_object_or_404(Product, id=product_id)
-    order_item = OrderItem.objects.filter(
-        order__user=request.user, product=product
-    ).first()
+    if product.id not in owned_product_ids(request.user):
+        messages.error(request, "You have not purchased this product.")
+        return redirect("shop:product_detail", slug=product.slug)
 
+    order_item = (
+        OrderItem.objects.filter(
+            order__user=request.user, order__status="completed", product=product
+        )
+        .select_related("order__user", "product")
+        .first()
+    )
     if not order_item:
         messages.error(request, "You have not purchased this product.")
         return redirect("shop:product_detail", slug=product.slug)
@@ -275,7 +322,7 @@ def download_product(request, product_id):
 
     # Increment download count
     order_item.download_count += 1
-    order_item.save()
+    order_item.save(update_fields=["download_count"])
 
     # Send download link email
     try:
@@ -303,98 +350,63 @@ def download_product(request, product_id):
     return redirect(download_url)
 
 
+ORDER_HISTORY_PAGE_SIZE = 20
+
+
+def _order_history_page(request):
+    paginator = KeysetPaginator(
+        Order.objects.purchase_history(request.user),
+        ORDER_HISTORY_PAGE_SIZE,
+        ("-created", "-id"),
+    )
+    return paginator.get_page(request.GET.get("cursor"))
+
+
 @login_required
 def purchases(request):
-    orders = Order.objects.filter(user=request.user).order_by("-created")
+    orders = _order_history_page(request)
     return render(request, "shop/purchases.html", {"orders": orders})
 
 
 def category_list(request, slug):
-    category = get_object_or_404(Category, slug=slug)
+    category = category_registry.get_or_404(slug)
     products = Product.objects.filter(
         category=category, status__in=["publish", "soon", "full"], is_active=True
-    ).order_by("order", "-created")
-    categories = Category.objects.all()
+    ).with_review_stats()
 
-    paginator = Paginator(products, 20)
-    page = request.GET.get("page")
-    products = paginator.get_page(page)
+    paginator = KeysetPaginator(
+        products,
+        20,
+        ("order", "-created", "-id"),
+        count_cache_key=f"shop:category:{category.pk}:count",
+    )
+    products = paginator.get_page(request.GET.get("cursor"))
+    favourite_ids = favourite_product_ids(request.user, products)
 
     return render(
         request,
-        "core/home.html",
+        "shop/category.html",
         {
             "products": products,
-            "categories": categories,
-            "current_category": category,
-            "stripe_publishable_key": settings.STRIPE_PUBLISHABLE_KEY,
+            "category": category,
+            "favourite_ids": favourite_ids,
+            "owned_ids": owned_product_ids(request.user),
         },
     )
 
 
 @login_required
 def order_history(request):
-    orders = Order.objects.filter(user=request.user).order_by("-created")
+    orders = _order_history_page(request)
     return render(request, "shop/order_history.html", {"orders": orders})
 
 
 @login_required
 def order_detail(request, order_id):
-    order = get_object_or_404(Order, order_id=order_id, user=request.user)
-    return render(request, "shop/purchases.html", {"order": order})
-
-
-@csrf_exempt
-@require_POST
-def stripe_webhook(request):
-    payload = request.body
-    sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
-
-    try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
-        )
-    except ValueError as e:
-        logger.error(f"Something failed: {str(e)}")
-        return HttpResponse(status=400)
-    except stripe.error.SignatureVerificationError as e:
-        logger.error(f"Something failed: {str(e)}")
-        return HttpResponse(status=400)
-
-    if event.type == "payment_intent.succeeded":
-        payment_intent = event.data.object
-        handle_successful_payment(payment_intent)
-    elif event.type == "payment_intent.payment_failed":
-        payment_intent = event.data.object
-        handle_failed_payment(payment_intent)
-
-    return HttpResponse(status=200)
-
-
-def handle_successful_payment(payment_intent):
-    order = Order.objects.filter(payment_intent_id=payment_intent.id).first()
-    if order and not order.paid:
-        order.paid = True
-        order.status = "completed"
-        order.save()
-
-        try:
-            for order_item in order.items.all():
-                send_download_link_email(order_item)
-        except Exception as e:
-            print(f"Error sending download emails in webhook: {str(e)}")
-
-        try:
-            send_order_confirmation_email(order)
-        except Exception as e:
-            print(f"Error sending order confirmation email: {str(e)}")
-
-
-def handle_failed_payment(payment_intent):
-    order = Order.objects.filter(payment_intent_id=payment_intent.id).first()
-    if order:
-        order.status = "failed"
-        order.save()
+    order = get_object_or_404(
+        Order.objects.purchase_history(request.user), order_id=order_id
+    )
+    return render(request, "shop/purchases.html", {"order": order, "orders": [order]})
 
 
 @login_required
@@ -417,7 +429,7 @@ def secure_download(request, order_item_id):
         # Decrement downloads_remaining and increment download_count
         order_item.downloads_remaining -= 1
         order_item.download_count += 1
-        order_item.save()
+        order_item.save(update_fields=["downloads_remaining", "download_count"])
 
     # Get the file path
     file_path = None
@@ -1,71 +1,162 @@
-import stripe
+import json
 import logging
-from django.conf import settings
+from datetime import timedelta
+
+import stripe
+from django.db import transaction
+from django.db.models import Q
 from django.http import HttpResponse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
-from .models import Order
-from .emails import send_download_link_email
+
+from .emails import (
+    send_admin_new_order_email,
+    send_download_link_email,
+    send_order_confirmation_email,
+)
+from .models import Order, StripeEvent
+from .payments import get_gateway
 
 logger = logging.getLogger(__name__)
 
+# Give up on an event after this many failed attempts (replay resets it)
+MAX_ATTEMPTS = 5
+
+# Wait before retrying a failed event, doubled per attempt: 1, 2, 4, 8 min
+RETRY_BACKOFF = timedelta(minutes=1)
 
+
+def retry_delay(attempts):
+    return RETRY_BACKOFF * 2 ** (attempts - 1)
+
+
+# -------------------------------
+# Ingest
+# -------------------------------
 @csrf_exempt
 @require_POST
 def stripe_webhook(request):
+    """
+    Verify, store and acknowledge. Processing happens in
+    `manage.py process_stripe_events`, so the response never waits on
+    fulfilment or email, and a retried delivery is dropped by the unique
+    event_id.
+    """
     payload = request.body
     sig_header = request.META.get("HTTP_STRIPE_SIGNATURE")
 
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
-        )
-    except (ValueError, stripe.error.SignatureVerificationError) as e:
+        event = get_gateway().construct_event(payload, sig_header)
+    except (ValueError, stripe.SignatureVerificationError) as e:
         logger.error(f"Stripe webhook error: {str(e)}")
         return HttpResponse(status=400)
 
-    event_type = event["type"]
-    payment_intent = event["data"]["object"]
-
-    if event_type == "payment_intent.succeeded":
-        handle_payment_intent_succeeded(payment_intent)
-    elif event_type == "payment_intent.payment_failed":
-        handle_payment_intent_failed(payment_intent)
+    if event["type"] in HANDLERS:
+        record_event(event["id"], event["type"], json.loads(payload))
 
     return HttpResponse(status=200)
 
 
-def handle_payment_intent_succeeded(payment_intent):
-    order = Order.objects.filter(
-        payment_intent_id=payment_intent.id, status="pending"
-    ).first()
+def record_event(event_id, event_type, payload):
+    """Store an event once; returns False for a duplicate delivery"""
+    _, created = StripeEvent.objects.get_or_create(
+        event_id=event_id,
+        defaults={"event_type": event_type, "payload": payload},
+    )
+    return created
+
+
+# -------------------------------
+# Processing
+# -------------------------------
+def process_pending_events(batch_size=50, max_attempts=MAX_ATTEMPTS):
+    """
+    Claim a batch of unprocessed events and run their handlers.
+
+    Rows are locked with SKIP LOCKED, so several workers can drain the table
+    side by side without picking the same event. Each event runs in its own
+    savepoint: one failure is recorded and retried after retry_delay() without
+    undoing the rest of the batch. Returns the number of events handled.
+    """
+    due = Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now())
+    with transaction.atomic():
+        events = list(
+            StripeEvent.objects.select_for_update(skip_locked=True)
+            .filter(due, status__in=["pending", "failed"], attempts__lt=max_attempts)
+            .order_by("received_at")[:batch_size]
+        )
+        for event in events:
+            process_event(event)
+    return len(events)
 
-    if order:
-        order.status = "completed"
-        order.paid = True
-        order.save()
 
-        for order_item in order.items.all():
-            product = order_item.product
-            product.purchase_count += order_item.quantity
-            product.save()
+def process_event(event):
+    event.attempts += 1
+    try:
+        with transaction.atomic():
+            handler = HANDLERS.get(event.event_type)
+            if handler:
+                handler(event.data_object)
+    except Exception as e:
+        logger.exception(f"Failed to process Stripe event {event.event_id}")
+        event.status = "failed"
+        event.last_error = str(e)
+        event.next_attempt_at = timezone.now() + retry_delay(event.attempts)
+    else:
+        event.status = "processed"
+        event.last_error = ""
+        event.next_attempt_at = None
+        event.processed_at = timezone.now()
+    event.save(
+        update_fields=[
+            "status",
+            "attempts",
+            "last_error",
+            "next_attempt_at",
+            "processed_at",
+        ]
+    )
 
-        try:
-            for order_item in order.items.all():
-                send_download_link_email(order_item)
-                from .emails import send_admin_new_order_email
 
-                send_admin_new_order_email(order)
+def handle_payment_intent_succeeded(payment_intent):
+    order = (
+        Order.objects.select_for_update()
+        .filter(payment_intent_id=payment_intent["id"])
+        .first()
+    )
+    # Orders completed by payment_success are already fulfilled
+    if order is None or order.status == "completed":
+        return
 
-        except Exception as e:
-            logger.error(f"Error sending download emails in webhook: {str(e)}")
+    order.status = "completed"
+    order.paid = True
+    order.save()  # indexes the Purchase rows, see Purchase.record_order
+
+    items = list(order.items.select_related("product"))
+    for order_item in items:
+        order_item.product.increment_purchase_count(order_item.quantity)
+
+    transaction.on_commit(lambda: send_fulfilment_emails(order, items))
 
 
 def handle_payment_intent_failed(payment_intent):
-    order = Order.objects.filter(
-        payment_intent_id=payment_intent.id, status="pending"
-    ).first()
+    Order.objects.filter(
+        payment_intent_id=payment_intent["id"], status="pending"
+    ).update(status="failed", updated=timezone.now())
 
-    if order:
-        order.status = "failed"
-        order.save()
+
+def send_fulfilment_emails(order, items):
+    try:
+        for order_item in items:
+            send_download_link_email(order_item)
+        send_order_confirmation_email(order)
+        send_admin_new_order_email(order)
+    except Exception as e:
+        logger.error(f"Error sending fulfilment emails for {order}: {str(e)}")
+
+
+HANDLERS = {
+    "payment_intent.succeeded": handle_payment_intent_succeeded,
+    "payment_intent.payment_failed": handle_payment_intent_failed,
+}
@@ -0,0 +1,168 @@
+import fnmatch
+import random
+import re
+import threading
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Per-thread DatabaseWrapper attributes: the timeout the current request
+# wants, and the one the server session actually has
+_WANTED_ATTR = "_statement_timeout_wanted"
+_CURRENT_ATTR = "_statement_timeout_current"
+
+
+# -------------------------------
+# Statement timeouts
+# -------------------------------
+def statement_timeout(name):
+    """
+    Tag a view function or class with a STATEMENT_TIMEOUTS class name
+    ("batch", "interactive", ...) for StatementTimeoutMiddleware.
+    """
+
+    def decorator(view):
+        if isinstance(view, type):
+            view.statement_timeout = name
+            return view
+
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            return view(*args, **kwargs)
+
+        wrapped.statement_timeout = name
+        return wrapped
+
+    return decorator
+
+
+def timeout_for_view(view_func=None, resolver_match=None):
+    """
+    Milliseconds for a resolved view: its tag, admin, else "default".
+    Without a view (before URL resolution) that is the "default" class.
+    """
+    timeouts = getattr(settings, "STATEMENT_TIMEOUTS", {})
+    name = getattr(view_func, "statement_timeout", None)
+    if name is None:
+        view_class = getattr(view_func, "view_class", None)
+        name = getattr(view_class, "statement_timeout", None)
+    if name is None and resolver_match and "admin" in resolver_match.namespaces:
+        name = "admin"
+    if name not in timeouts:
+        name = "default"
+    return timeouts.get(name, 0)
+
+
+def apply_statement_timeout(connection, milliseconds):
+    """
+    Ask for PostgreSQL's statement_timeout on this connection (0 disables it).
+
+    Nothing is sent if the session already has that value, which is the
+    common case on a persistent connection, and nothing is sent until the
+    connection is opened, so views that never touch the database don't
+    connect just to set it. Other backends are left alone.
+    """
+    if connection.vendor != "postgresql":
+        return
+    setattr(connection, _WANTED_ATTR, milliseconds)
+    if connection.connection is not None:
+        _sync_timeout(connection)
+
+
+def _sync_timeout(connection):
+    wanted = getattr(connection, _WANTED_ATTR, None)
+    if wanted is None or getattr(connection, _CURRENT_ATTR, None) == wanted:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('statement_timeout', %s, false)", [str(wanted)]
+        )
+    setattr(connection, _CURRENT_ATTR, wanted)
+
+
+@receiver(connection_created)
+def reset_statement_timeout(sender, connection, **kwargs):
+    # A new (or newly borrowed pooled) connection may carry any value, so
+    # send the wanted one; inside a request that is at least the default
+    setattr(connection, _CURRENT_ATTR, None)
+    _sync_timeout(connection)
+
+
+# -------------------------------
+# Read replicas
+# -------------------------------
+_local = threading.local()
+
+
+def replica_aliases():
+    return getattr(settings, "REPLICA_DATABASES", [])
+
+
+def view_name(view_func):
+    """Dotted path of a view function, or of the class behind as_view()"""
+    target = getattr(view_func, "view_class", view_func)
+    return f"{target.__module__}.{target.__qualname__}"
+
+
+@lru_cache(maxsize=None)
+def _replica_pattern(patterns):
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns))
+
+
+def is_replica_view(view_func):
+    """Whether REPLICA_VIEWS (dotted paths, * wildcards) lists this view"""
+    patterns = tuple(getattr(settings, "REPLICA_VIEWS", ()))
+    if not patterns:
+        return False
+    return _replica_pattern(patterns).match(view_name(view_func)) is not None
+
+
+def start_replica_reads():
+    """Let reads of REPLICA_APPS models in this request go to a replica"""
+    _local.replica = True
+
+
+def reset_replica_state():
+    _local.replica = False
+    _local.wrote = False
+
+
+def wrote_in_request():
+    return getattr(_local, "wrote", False)
+
+
+class ReplicaRouter:
+    """
+    Sends reads of catalogue models (REPLICA_APPS) to a random replica from
+    REPLICA_DATABASES, but only inside requests that ReplicaMiddleware has
+    opened for it: read-only views listed in REPLICA_VIEWS, for visitors
+    who haven't written anything recently. Everything else, and every
+    write, uses "default". After the first write in a request, or while a
+    transaction is open on the primary (which replicas can't see into, and
+    which TestCase always holds), its reads return to the primary too.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not getattr(_local, "replica", False) or getattr(_local, "wrote", False):
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        if model._meta.app_label not in getattr(settings, "REPLICA_APPS", ()):
+            return None
+        replicas = replica_aliases()
+        return random.choice(replicas) if replicas else None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in getattr(settings, "REPLICA_UNPINNED_APPS", ()):
+            _local.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {"default", *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,296 @@
+import bisect
+import hmac
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import PyMemcacheCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+# Upper bounds in seconds / queries, Prometheus style (+Inf is implicit)
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+# -------------------------------
+# Aggregation
+# -------------------------------
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Process-local histograms and counters keyed by (name, labels).
+
+    Each worker process keeps its own numbers, as with the blocklist and
+    login throttle counters; scrape every worker or run one per container.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = defaultdict(float)
+        self._help = {}
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, labels, value, buckets=TIME_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, labels, amount=1):
+        if not amount:
+            return
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self, extra_counters=()):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted([*self._counters.items(), *extra_counters])
+
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), histogram in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, count in zip([*histogram.buckets, "+Inf"], histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return value.replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    body = ",".join(f'{key}="{_escape(value)}"' for key, value in pairs)
+    return "{" + body + "}"
+
+
+metrics = MetricsRegistry()
+metrics.describe("zestizm_request_duration_seconds", "Wall time per view")
+metrics.describe("zestizm_db_queries", "Database queries per request")
+metrics.describe("zestizm_db_duration_seconds", "Database time per request")
+metrics.describe("zestizm_template_duration_seconds", "Template render time")
+metrics.describe("zestizm_requests_total", "Sampled requests by view and status")
+metrics.describe("zestizm_cache_requests_total", "Cache lookups by result")
+metrics.describe("zestizm_blocked_requests_total", "Requests the blocklist rejected")
+metrics.describe("zestizm_login_throttle_total", "Login throttle events")
+
+
+# -------------------------------
+# Per-request collection
+# -------------------------------
+_local = threading.local()
+
+
+class RequestStats:
+    __slots__ = (
+        "queries",
+        "db_time",
+        "cache_hits",
+        "cache_misses",
+        "template_time",
+    )
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+def start_request():
+    _local.stats = RequestStats()
+    return _local.stats
+
+
+def finish_request():
+    _local.stats = None
+
+
+def current_stats():
+    """Stats of the sampled request running on this thread, else None"""
+    return getattr(_local, "stats", None)
+
+
+class CacheMetricsMixin:
+    """
+    Counts hits and misses of get()/get_many() for the sampled request.
+
+    Backends build one on the other (locmem's get_many() calls get(), the
+    database cache's get() calls get_many()), so only the outermost call on
+    a thread is counted.
+    """
+
+    _missing = object()
+    _nested = threading.local()
+
+    def _inside_counted_call(self):
+        return getattr(self._nested, "active", False)
+
+    def get(self, key, default=None, version=None):
+        if self._inside_counted_call():
+            return super().get(key, default, version)
+        self._nested.active = True
+        try:
+            value = super().get(key, self._missing, version)
+        finally:
+            self._nested.active = False
+        stats = current_stats()
+        if value is self._missing:
+            if stats:
+                stats.cache_misses += 1
+            return default
+        if stats:
+            stats.cache_hits += 1
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if self._inside_counted_call():
+            return super().get_many(keys, version)
+        self._nested.active = True
+        try:
+            found = super().get_many(keys, version)
+        finally:
+            self._nested.active = False
+        stats = current_stats()
+        if stats:
+            stats.cache_hits += len(found)
+            stats.cache_misses += len(keys) - len(found)
+        return found
+
+
+class InstrumentedLocMemCache(CacheMetricsMixin, LocMemCache):
+    pass
+
+
+class InstrumentedRedisCache(CacheMetricsMixin, RedisCache):
+    pass
+
+
+class InstrumentedPyMemcacheCache(CacheMetricsMixin, PyMemcacheCache):
+    pass
+
+
+class InstrumentedDatabaseCache(CacheMetricsMixin, DatabaseCache):
+    pass
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        stats = current_stats()
+        if stats is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend that adds top-level render time to the stats"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+# -------------------------------
+# Endpoint
+# -------------------------------
+def _external_counters():
+    from accounts.throttling import get_throttle_stats
+    from zestizm.middleware import get_blocked_hits
+
+    counters = [
+        (("zestizm_blocked_requests_total", (("reason", reason),)), count)
+        for reason, count in get_blocked_hits().items()
+    ]
+    counters += [
+        (("zestizm_login_throttle_total", (("event", event),)), count)
+        for event, count in get_throttle_stats().items()
+    ]
+    return counters
+
+
+def _authorised(request):
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        supplied = request.META.get("HTTP_AUTHORIZATION", "")
+        if hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+            return True
+    user = getattr(request, "user", None)
+    return bool(user and user.is_staff)
+
+
+def metrics_view(request):
+    """Prometheus scrape target; staff or `Authorization: Bearer METRICS_TOKEN`"""
+    if not _authorised(request):
+        raise PermissionDenied
+    return HttpResponse(
+        metrics.render(_external_counters()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -1,16 +1,243 @@
+import random
 import re
-from django.http import Http404
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+
+from .db import (
+    apply_statement_timeout,
+    is_replica_view,
+    replica_aliases,
+    reset_replica_state,
+    start_replica_reads,
+    timeout_for_view,
+    wrote_in_request,
+)
+from .metrics import QUERY_BUCKETS, finish_request, metrics, start_request
+
+# Scanner probes we never serve (WordPress, PHP, leaked dotfiles). Each
+# pattern must match a whole path segment, so "/blog/wp-admin-tips/" is fine.
+DEFAULT_BLOCKED_PATHS = [
+    r"wp-admin",
+    r"wp-content",
+    r"wp-includes",
+    r"wp-login(?:\.php)?",
+    r"[^/]*\.php",
+    r"\.env(?:\.[^/]*)?",
+    r"\.git",
+]
+
+# Vulnerability scanners that announce themselves
+DEFAULT_BLOCKED_USER_AGENTS = [
+    r"sqlmap",
+    r"nikto",
+    r"masscan",
+    r"zgrab",
+]
+
+STATUS_BODIES = {404: b"Not Found", 410: b"Gone"}
+
+_hits = Counter()
+_hits_lock = threading.Lock()
+
+
+def get_blocked_hits():
+    """Blocked request counts by reason ("path" / "user_agent") for metrics"""
+    with _hits_lock:
+        return dict(_hits)
+
+
+def _compile(patterns, flags=0):
+    if not patterns:
+        return None
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), flags)
+
+
+def _compile_segments(patterns):
+    """Anchor each pattern to one path segment: /<pattern>/ or /<pattern>$"""
+    if not patterns:
+        return None
+    return _compile([f"(?:^|/)(?:{pattern})(?:/|$)" for pattern in patterns])
+
+
+class BlocklistMiddleware:
+    """
+    Reject scanner traffic before anything else runs.
+
+    Sits first in MIDDLEWARE and answers matching requests with a tiny static
+    response, so probes never reach sessions, the database or the 404 template.
+    Patterns come from BLOCKED_PATH_PATTERNS / BLOCKED_USER_AGENT_PATTERNS in
+    settings (or the defaults above) and are compiled once at startup; path
+    patterns are anchored to path segments.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.path_pattern = _compile_segments(
+            getattr(settings, "BLOCKED_PATH_PATTERNS", DEFAULT_BLOCKED_PATHS)
+        )
+        self.user_agent_pattern = _compile(
+            getattr(
+                settings, "BLOCKED_USER_AGENT_PATTERNS", DEFAULT_BLOCKED_USER_AGENTS
+            ),
+            re.IGNORECASE,
+        )
+        self.status = getattr(settings, "BLOCKED_RESPONSE_STATUS", 404)
+        self.body = STATUS_BODIES.get(self.status, b"")
+
+    def __call__(self, request):
+        reason = self.match(request)
+        if reason:
+            with _hits_lock:
+                _hits[reason] += 1
+            return HttpResponse(
+                self.body, status=self.status, content_type="text/plain"
+            )
+        return self.get_response(request)
+
+    def match(self, request):
+        if self.path_pattern and self.path_pattern.search(request.path_info):
+            return "path"
+        if self.user_agent_pattern:
+            user_agent = request.META.get("HTTP_USER_AGENT", "")
+            if user_agent and self.user_agent_pattern.search(user_agent):
+                return "user_agent"
+        return None
+
+
+class MetricsMiddleware:
+    """
+    Per-view wall time, DB queries/time, cache hits/misses and template time
+    for a METRICS_SAMPLE_RATE share of requests, aggregated in
+    zestizm.metrics and served at /metrics.
+
+    With a sample rate of 0 the middleware removes itself at startup, so
+    unsampled deployments pay nothing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "METRICS_SAMPLE_RATE", 0.0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        stats = start_request()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            finish_request()
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else "unmatched"
+        if view == "metrics":
+            return response
+
+        labels = {"view": view}
+        metrics.observe("zestizm_request_duration_seconds", labels, duration)
+        metrics.observe("zestizm_db_duration_seconds", labels, stats.db_time)
+        metrics.observe("zestizm_db_queries", labels, stats.queries, QUERY_BUCKETS)
+        if stats.template_time:
+            metrics.observe(
+                "zestizm_template_duration_seconds", labels, stats.template_time
+            )
+        metrics.inc(
+            "zestizm_requests_total", {"view": view, "status": response.status_code}
+        )
+        metrics.inc(
+            "zestizm_cache_requests_total",
+            {"view": view, "result": "hit"},
+            stats.cache_hits,
+        )
+        metrics.inc(
+            "zestizm_cache_requests_total",
+            {"view": view, "result": "miss"},
+            stats.cache_misses,
+        )
+        return response
+
+
+class StatementTimeoutMiddleware:
+    """
+    Caps query time per view on PostgreSQL with a server-side
+    statement_timeout, so one runaway query can't hold a worker and a
+    connection indefinitely. Every request starts on the "default" class,
+    applied to connections already open and to any opened later, so queries
+    made before the view resolves are capped too; process_view then moves
+    to the view's class, picked with zestizm.db.statement_timeout() (admin
+    views use "admin"). Management commands are unaffected. Removed at
+    startup when no database is PostgreSQL.
+    """
 
-class BlockWPExploitAttemptsMiddleware:
     def __init__(self, get_response):
+        if not any(conn.vendor == "postgresql" for conn in connections.all()):
+            raise MiddlewareNotUsed
         self.get_response = get_response
-        self.wp_patterns = re.compile(r'(wp-admin|wp-content|wp-includes|wp-login|\.php$)')
 
     def __call__(self, request):
-        path = request.path_info
-        if self.wp_patterns.search(path):
-            raise Http404()
-        
-        response = self.get_response(request)
+        # A persistent connection still has the last view's value
+        milliseconds = timeout_for_view()
+        for connection in connections.all():
+            apply_statement_timeout(connection, milliseconds)
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        milliseconds = timeout_for_view(view_func, request.resolver_match)
+        for connection in connections.all():
+            apply_statement_timeout(connection, milliseconds)
+
+
+class ReplicaMiddleware:
+    """
+    Opens replica reads (zestizm.db.ReplicaRouter) for GET/HEAD requests to
+    REPLICA_VIEWS. A request that writes sets a short-lived cookie, and
+    while it lasts that visitor reads from the primary, so their own
+    orders, reviews and favourites show up straight away despite
+    replication lag. Removed at startup when REPLICA_DATABASES is empty.
+    """
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.window = getattr(settings, "REPLICA_STICKY_SECONDS", 10)
+        self.cookie = getattr(settings, "REPLICA_STICKY_COOKIE", "primary_reads")
+
+    def __call__(self, request):
+        reset_replica_state()
+        try:
+            response = self.get_response(request)
+            if wrote_in_request() and self.window:
+                response.set_cookie(
+                    self.cookie,
+                    "1",
+                    max_age=self.window,
+                    httponly=True,
+                    samesite="Lax",
+                    secure=request.is_secure(),
+                )
+        finally:
+            reset_replica_state()
         return response
-    
\ No newline at end of file
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in ("GET", "HEAD")
+            and self.cookie not in request.COOKIES
+            and is_replica_view(view_func)
+        ):
+            start_replica_reads()
@@ -0,0 +1,211 @@
+import logging
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+logger = logging.getLogger("zestizm.nplusone")
+
+# Same query shape this many times in one request counts as an N+1
+DEFAULT_THRESHOLD = 3
+
+_IN_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_NUMBER = re.compile(r"\b\d+\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SPACE = re.compile(r"\s+")
+
+
+class NPlusOneError(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """
+    Reduce SQL to its shape: Django passes values as %s params already, so
+    only IN lists of varying length and inlined literals (LIMIT, OFFSET)
+    need folding.
+    """
+    sql = _STRING.sub("?", sql)
+    sql = _IN_LIST.sub("(%s...)", sql)
+    sql = _NUMBER.sub("?", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def _project_root():
+    return Path(getattr(settings, "BASE_DIR", Path.cwd())).resolve()
+
+
+def query_origin():
+    """
+    Where the current query came from: the innermost template node being
+    rendered ("shop/detail.html:244"), else the nearest frame in project code.
+    """
+    root = str(_project_root())
+    code_location = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == "render_annotated":
+            node = frame.f_locals.get("self")
+            origin = getattr(node, "origin", None)
+            token = getattr(node, "token", None)
+            if origin is not None and token is not None:
+                return f"{origin.template_name}:{token.lineno}"
+        if (
+            code_location is None
+            and code.co_filename.startswith(root)
+            and "site-packages" not in code.co_filename
+            and not code.co_filename.endswith("nplusone.py")
+        ):
+            path = Path(code.co_filename).relative_to(root)
+            code_location = f"{path}:{frame.f_lineno}"
+        frame = frame.f_back
+    return code_location or "unknown"
+
+
+class QueryPatternDetector:
+    """
+    Execute wrapper that counts SELECT shapes and remembers where each
+    repeated shape was first issued.
+    """
+
+    def __init__(self, threshold=None):
+        if threshold is None:
+            threshold = getattr(settings, "NPLUSONE_THRESHOLD", DEFAULT_THRESHOLD)
+        self.threshold = threshold
+        self.counts = Counter()
+        self.origins = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        # Only reads: repeated INSERT/UPDATE in a loop is a different problem
+        if sql.lstrip()[:6].upper() != "SELECT":
+            return execute(sql, params, many, context)
+        shape = fingerprint(sql)
+        self.counts[shape] += 1
+        if self.counts[shape] == 2:
+            # Locate lazily: only shapes that repeat pay for the stack walk
+            self.origins[shape] = query_origin()
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def reset(self):
+        self.counts.clear()
+        self.origins.clear()
+
+    @property
+    def findings(self):
+        """[(count, origin, shape)] for shapes at or over the threshold"""
+        return [
+            (count, self.origins.get(shape, "unknown"), shape)
+            for shape, count in self.counts.most_common()
+            if count >= self.threshold
+        ]
+
+    def report(self):
+        return "\n".join(
+            f"{count}x at {origin}: {shape[:200]}"
+            for count, origin, shape in self.findings
+        )
+
+
+class NPlusOneMiddleware:
+    """
+    Logs repeated query shapes per request while DEBUG is on; raises
+    NPlusOneError instead when NPLUSONE_RAISE is set. Removed at startup
+    outside DEBUG.
+    """
+
+    def __init__(self, get_response):
+        if not settings.DEBUG:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.raise_errors = getattr(settings, "NPLUSONE_RAISE", False)
+
+    def __call__(self, request):
+        detector = QueryPatternDetector()
+        with detector.capture():
+            response = self.get_response(request)
+        if detector.findings:
+            message = f"Possible N+1 queries in {request.path}:\n{detector.report()}"
+            if self.raise_errors:
+                raise NPlusOneError(message)
+            logger.warning(message)
+        return response
+
+
+class NPlusOneTestMixin:
+    """
+    TestCase mixin: watches every test and fails it on repeated query shapes
+    when `nplusone_fail` is true (default: the NPLUSONE_RAISE setting);
+    otherwise findings are only logged. Like NPlusOneMiddleware, each
+    test client request is checked on its own, as is the test code around
+    them. Use assertNoNPlusOne() to check a single block explicitly.
+    """
+
+    nplusone_fail = None
+
+    def setUp(self):
+        super().setUp()
+        self._nplusone = QueryPatternDetector()
+        self._nplusone_reports = []
+        self._nplusone_scope = "test code"
+        stack = ExitStack()
+        stack.enter_context(self._nplusone.capture())
+        request_started.connect(self._nplusone_request_started)
+        request_finished.connect(self._nplusone_request_finished)
+        stack.callback(request_started.disconnect, self._nplusone_request_started)
+        stack.callback(request_finished.disconnect, self._nplusone_request_finished)
+        self.addCleanup(self._check_nplusone, stack)
+
+    def _nplusone_request_started(self, sender, environ=None, **kwargs):
+        self._close_nplusone_scope()
+        self._nplusone_scope = (environ or {}).get("PATH_INFO", "request")
+
+    def _nplusone_request_finished(self, sender, **kwargs):
+        self._close_nplusone_scope()
+        self._nplusone_scope = "test code"
+
+    def _close_nplusone_scope(self):
+        if self._nplusone.findings:
+            self._nplusone_reports.append(
+                f"{self._nplusone_scope}:\n{self._nplusone.report()}"
+            )
+        self._nplusone.reset()
+
+    def _check_nplusone(self, stack):
+        stack.close()
+        self._close_nplusone_scope()
+        if not self._nplusone_reports:
+            return
+        fail = self.nplusone_fail
+        if fail is None:
+            fail = getattr(settings, "NPLUSONE_RAISE", False)
+        reports = "\n".join(self._nplusone_reports)
+        message = f"Possible N+1 queries in {self.id()}\n{reports}"
+        if fail:
+            raise NPlusOneError(message)
+        logger.warning(message)
+
+    @contextmanager
+    def assertNoNPlusOne(self, threshold=None):
+        detector = QueryPatternDetector(threshold)
+        with detector.capture():
+            yield detector
+        # Checked here, so don't report the same queries again at cleanup
+        watcher = getattr(self, "_nplusone", None)
+        if watcher is not None:
+            watcher.counts -= detector.counts
+        if detector.findings:
+            raise NPlusOneError(f"Possible N+1 queries:\n{detector.report()}")
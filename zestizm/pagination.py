@@ -0,0 +1,212 @@
+import base64
+import binascii
+import json
+import math
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def _dump_value(value):
+    # Keep full microsecond precision; DjangoJSONEncoder truncates datetimes
+    # to milliseconds, which would make the seek skip or repeat rows.
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, float, str, bool)):
+        return value
+    return str(value)
+
+
+class KeysetPaginator:
+    """
+    Cursor based paginator.
+
+    Pages are fetched with a WHERE clause on the ordering columns of the last
+    row seen, instead of COUNT(*) + OFFSET, so page 500 costs the same as
+    page 1. The ordering must be unique, so always finish it with "id"/"-id".
+    """
+
+    def __init__(
+        self,
+        queryset,
+        per_page,
+        ordering,
+        count_cache_key=None,
+        count_timeout=300,
+    ):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.count_cache_key = count_cache_key
+        self.count_timeout = count_timeout
+        self.fields = [name.lstrip("-") for name in self.ordering]
+
+    # -------------------------------
+    # Cursor encoding
+    # -------------------------------
+    def encode_cursor(self, obj, direction, number):
+        values = [_dump_value(getattr(obj, field)) for field in self.fields]
+        data = json.dumps({"v": values, "d": direction, "n": number})
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        """Return (values, direction, number) or None for a bad cursor"""
+        if not cursor:
+            return None
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            raw_values = data["v"]
+            direction = data["d"]
+            number = max(int(data.get("n", 1)), 1)
+            if direction not in ("next", "prev") or len(raw_values) != len(
+                self.fields
+            ):
+                return None
+            model = self.queryset.model
+            values = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, raw_values)
+            ]
+        except (ValueError, TypeError, KeyError, binascii.Error, ValidationError):
+            return None
+        return values, direction, number
+
+    # -------------------------------
+    # Query building
+    # -------------------------------
+    def _seek_filter(self, values, reverse):
+        """
+        Build (a > x) OR (a = x AND b > y) OR ... for the ordering columns,
+        flipping the comparison for descending fields and for reverse seeks.
+        """
+        condition = Q()
+        equal_so_far = Q()
+        for name, value in zip(self.ordering, values):
+            field = name.lstrip("-")
+            descending = name.startswith("-")
+            lookup = "lt" if descending != reverse else "gt"
+            condition |= equal_so_far & Q(**{f"{field}__{lookup}": value})
+            equal_so_far &= Q(**{field: value})
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith("-") else f"-{name}" for name in self.ordering
+        ]
+
+    def get_page(self, cursor=None):
+        decoded = self.decode_cursor(cursor)
+        queryset = self.queryset
+
+        if decoded is None:
+            rows = list(queryset.order_by(*self.ordering)[: self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            return KeysetPage(
+                rows[: self.per_page], self, 1, has_next=has_next, has_previous=False
+            )
+
+        values, direction, number = decoded
+        if direction == "next":
+            rows = list(
+                queryset.filter(self._seek_filter(values, reverse=False)).order_by(
+                    *self.ordering
+                )[: self.per_page + 1]
+            )
+            has_next = len(rows) > self.per_page
+            return KeysetPage(
+                rows[: self.per_page],
+                self,
+                number,
+                has_next=has_next,
+                has_previous=number > 1,
+            )
+
+        rows = list(
+            queryset.filter(self._seek_filter(values, reverse=True)).order_by(
+                *self._reversed_ordering()
+            )[: self.per_page + 1]
+        )
+        has_previous = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        rows.reverse()
+        return KeysetPage(
+            rows,
+            self,
+            number if has_previous else 1,
+            has_next=True,
+            has_previous=has_previous,
+        )
+
+    # -------------------------------
+    # Optional approximate totals
+    # -------------------------------
+    @property
+    def count(self):
+        """
+        Cached total row count, or None when no cache key was given.
+        Only meant for "page x of about y" labels, so it may lag behind.
+        """
+        if not self.count_cache_key:
+            return None
+        total = cache.get(self.count_cache_key)
+        if total is None:
+            total = self.queryset.count()
+            cache.set(self.count_cache_key, total, self.count_timeout)
+        return total
+
+    @property
+    def num_pages(self):
+        total = self.count
+        if total is None:
+            return None
+        return max(math.ceil(total / self.per_page), 1)
+
+
+class KeysetPage:
+    """A single page; mirrors the bits of django's Page the templates use."""
+
+    def __init__(self, object_list, paginator, number, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.number = number
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.encode_cursor(
+            self.object_list[-1], "next", self.number + 1
+        )
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return self.paginator.encode_cursor(
+            self.object_list[0], "prev", max(self.number - 1, 1)
+        )
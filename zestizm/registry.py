@@ -0,0 +1,81 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.http import Http404
+
+
+class ModelRegistry:
+    """
+    In-process copy of a small lookup table (e.g. categories).
+
+    Each worker keeps the rows in memory and reloads them when the shared
+    version number in the cache changes. Call invalidate() after save/delete
+    commits so every worker picks up the change on its next lookup. With a
+    process-local cache other workers never see the new version, so a copy
+    is also reloaded once it is `max_age` seconds old.
+    """
+
+    def __init__(self, model, namespace, lookup_field="slug", max_age=60):
+        self.model = model
+        self.lookup_field = lookup_field
+        self.version_key = f"registry:{namespace}:version"
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._version = None
+        self._loaded_at = 0.0
+        self._objects = []
+        self._by_key = {}
+
+    def _shared_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, 1, timeout=None)
+            version = cache.get(self.version_key, 1)
+        return version
+
+    def _is_current(self, version):
+        if version != self._version:
+            return False
+        return not self.max_age or time.monotonic() - self._loaded_at < self.max_age
+
+    def _ensure_loaded(self):
+        version = self._shared_version()
+        if self._is_current(version):
+            return
+        with self._lock:
+            if self._is_current(version):
+                return
+            # Never from a read replica: a lagging copy would stay cached
+            # under the new version until the next invalidation
+            objects = list(self.model.objects.using(DEFAULT_DB_ALIAS))
+            self._by_key = {getattr(obj, self.lookup_field): obj for obj in objects}
+            self._objects = objects
+            self._version = version
+            self._loaded_at = time.monotonic()
+
+    def all(self):
+        """Return every row, in the model's default ordering"""
+        self._ensure_loaded()
+        return list(self._objects)
+
+    def get(self, key):
+        self._ensure_loaded()
+        return self._by_key.get(key)
+
+    def get_or_404(self, key):
+        obj = self.get(key)
+        if obj is None:
+            raise Http404(
+                f"No {self.model._meta.object_name} matches the given query."
+            )
+        return obj
+
+    def invalidate(self):
+        try:
+            cache.incr(self.version_key)
+        except ValueError:
+            # Key missing or evicted: any new value forces a reload
+            cache.set(self.version_key, (self._version or 0) + 1, timeout=None)
+        self._version = None
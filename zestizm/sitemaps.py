@@ -1,9 +1,12 @@
 from django.contrib.sitemaps import Sitemap
 from django.urls import reverse
 from django.utils import timezone
-from blog.models import Post, Category as BlogCategory
-from shop.models import Product, Category as ShopCategory
+from blog.models import Post
+from blog.categories import category_registry as blog_categories
+from shop.models import Product
+from shop.categories import category_registry as shop_categories
 from infopages.models import InfoPage
+from zestizm.utils import truncate_words
 
 
 # --- Static pages ---
@@ -81,7 +84,10 @@ class BlogPostSitemap(Sitemap):
     changefreq = "weekly"
 
     def items(self):
-        return Post.objects.filter(status="published", publish_date__lte=timezone.now())
+        # Descriptions come from the stored excerpt, so skip the HTML body
+        return Post.objects.filter(
+            status="published", publish_date__lte=timezone.now()
+        ).defer("content")
 
     def lastmod(self, obj):
         return obj.updated
@@ -103,7 +109,7 @@ class BlogCategorySitemap(Sitemap):
     changefreq = "monthly"
 
     def items(self):
-        return BlogCategory.objects.all()
+        return blog_categories.all()
 
     def location(self, obj):
         return reverse("blog:category", kwargs={"slug": obj.slug})
@@ -115,7 +121,9 @@ class ShopProductSitemap(Sitemap):
     changefreq = "daily"
 
     def items(self):
-        return Product.objects.filter(status="publish", is_active=True)
+        return Product.objects.filter(status="publish", is_active=True).defer(
+            "description", "long_description"
+        )
 
     def lastmod(self, obj):
         return obj.updated
@@ -127,7 +135,7 @@ class ShopProductSitemap(Sitemap):
         return {
             "title": f"{obj.title} – Zestizm",
             "description": (
-                f"{obj.title}: {obj.description[:150]}... "
+                f"{obj.title}: {truncate_words(obj.excerpt, 150)}... "
                 "The Age-Positive Zestizm range. Return to a zest for life. Reignite zest in the life you already have."
             ),
             "keywords": "age postivity, age positive, zest for life, zest sparks, mini guide, emotional flexibility, small joys, zestizm",
@@ -139,7 +147,7 @@ class ShopCategorySitemap(Sitemap):
     changefreq = "weekly"
 
     def items(self):
-        return ShopCategory.objects.all()
+        return shop_categories.all()
 
     def location(self, obj):
         return reverse("shop:category", kwargs={"slug": obj.slug})
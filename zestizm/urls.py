@@ -5,6 +5,8 @@ from django.conf.urls.static import static
 from django.contrib.sitemaps.views import sitemap
 
 from core import views as core_views
+from .db import statement_timeout
+from .metrics import metrics_view
 from .sitemaps import sitemaps
 
 urlpatterns = [
@@ -14,8 +16,14 @@ urlpatterns = [
     path("blog/", include(("blog.urls", "blog"), namespace="blog")),
     path("accounts/", include(("accounts.urls", "accounts"), namespace="accounts")),
     path("tinymce/", include("tinymce.urls")),
-    path("sitemap.xml", sitemap, {"sitemaps": sitemaps}, name="sitemap"),
+    path(
+        "sitemap.xml",
+        statement_timeout("batch")(sitemap),
+        {"sitemaps": sitemaps},
+        name="sitemap",
+    ),
     path("robots.txt", core_views.robots_txt, name="robots_txt"),
+    path("metrics", metrics_view, name="metrics"),
     path("", include("infopages.urls")),  # this is okay because it uses specific slugs
     path("", include(("core.urls", "core"), namespace="core")),
 ]
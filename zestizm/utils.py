@@ -1,4 +1,5 @@
 from django.utils.text import slugify as django_slugify
+from html import unescape
 import re
 
 
@@ -31,3 +32,111 @@ def custom_slugify(text):
     text = sanitize_text(text)
     text = re.sub(r"([a-zA-Z])'([a-zA-Z])", r"\1-\2", text)
     return django_slugify(text)
+
+
+# Longest "-N" suffix the allocator makes room for when trimming a base
+_MAX_SUFFIX = len("-999999999")
+
+# What SlugField accepts (allow_unicode=False); anything else came from an
+# import or a hand-edited row
+VALID_SLUG_REGEX = r"^[-a-zA-Z0-9_]+$"
+
+
+def unique_slugify(instance, value, slug_field="slug", queryset=None, reserved=()):
+    """
+    Return a slug for `value` that is unique for `instance`'s model (or
+    within `queryset`), also avoiding anything in `reserved`.
+
+    Every slug that could collide, the base and its suffixed forms, shares a
+    prefix, so they are read with one `LIKE 'prefix%'` query and the first
+    free "-2", "-3", ... is picked in Python instead of probing with one
+    query per candidate.
+    """
+    model = instance.__class__
+    max_length = model._meta.get_field(slug_field).max_length
+    base = custom_slugify(value)[:max_length].strip("-") or "item"
+
+    # Suffixed candidates may have to trim the base to fit, so match on the
+    # part every candidate keeps
+    prefix = base[: max(max_length - _MAX_SUFFIX, 1)]
+    if queryset is None:
+        queryset = model._default_manager.all()
+    taken = queryset.filter(**{f"{slug_field}__startswith": prefix})
+    if instance.pk is not None:
+        taken = taken.exclude(pk=instance.pk)
+    taken = set(taken.values_list(slug_field, flat=True))
+    taken.update(reserved)
+
+    slug = base
+    suffix = 2
+    while slug in taken:
+        tail = f"-{suffix}"
+        slug = f"{base[: max_length - len(tail)].rstrip('-')}{tail}"
+        suffix += 1
+    return slug
+
+
+def invalid_slugs(queryset, slug_field="slug"):
+    """Rows whose slug SlugField would reject, filtered in the database"""
+    return queryset.exclude(**{f"{slug_field}__regex": VALID_SLUG_REGEX})
+
+
+_SKIPPED_BLOCKS = re.compile(
+    r"<(script|style|noscript|template)\b.*?(?:</\1\s*>|$)", re.I | re.S
+)
+_COMMENTS = re.compile(r"<!--.*?(?:-->|$)", re.S)
+_TAGS = re.compile(r"<[^>]*(?:>|$)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _strip_html(html):
+    html = _COMMENTS.sub(" ", html)
+    html = _SKIPPED_BLOCKS.sub(" ", html)
+    text = _TAGS.sub(" ", html)
+    return _WHITESPACE.sub(" ", unescape(text)).strip()
+
+
+def html_to_text(html, limit=None):
+    """
+    Visible text of an HTML fragment with whitespace collapsed.
+
+    With `limit`, only as much of the document as needed is scanned (a
+    window that doubles until it yields enough text) and the result is cut
+    at a word boundary, so a 160-character description of a long post does
+    not parse the whole post.
+    """
+    if not html:
+        return ""
+    if limit is None:
+        return _strip_html(html)
+
+    window = limit * 8
+    while True:
+        text = _strip_html(html[:window])
+        if len(text) > limit or window >= len(html):
+            break
+        window *= 2
+    return truncate_words(text, limit)
+
+
+def truncate_words(text, limit):
+    """Cut `text` to at most `limit` characters without splitting a word"""
+    if len(text) <= limit:
+        return text
+    cut = text[: limit + 1].rsplit(" ", 1)[0]
+    if not cut or cut == text[: limit + 1]:
+        cut = text[:limit]
+    return cut.rstrip(" ,;:-")
+
+
+# Long enough for the longest card excerpt the templates show
+EXCERPT_LENGTH = 400
+
+
+def summarise_html(*fragments, limit=EXCERPT_LENGTH):
+    """
+    (excerpt, word_count) over one or more HTML fields, for models to store
+    on save so that listings, feeds and sitemaps never parse HTML.
+    """
+    text = " ".join(filter(None, (html_to_text(html) for html in fragments)))
+    return truncate_words(text, limit), len(text.split())